@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Reusable detection renderer
+Draws bounding boxes and labels directly onto NumPy image buffers
+"""
+
+import cv2
+import numpy as np
+
+def build_palette(num_classes):
+    """
+    Build one distinct BGR color per class by stepping hues with the golden ratio.
+
+    Args:
+        num_classes (int): Number of classes the model can predict.
+
+    Returns:
+        list: num_classes (b, g, r) tuples.
+    """
+    num_classes = max(1, num_classes)
+    hues = (np.arange(num_classes) * 0.618033988749895 % 1.0 * 180).astype(np.uint8)
+    hsv = np.stack([hues, np.full(num_classes, 220, np.uint8), np.full(num_classes, 230, np.uint8)], axis=1)
+    bgr = cv2.cvtColor(hsv.reshape(1, -1, 3), cv2.COLOR_HSV2BGR).reshape(-1, 3)
+    return [tuple(int(c) for c in color) for color in bgr]
+
+class DetectionRenderer:
+    """
+    Draws detections in place on a BGR (or RGB) NumPy image.
+
+    Everything that does not depend on the frame is prepared once: the font, the
+    per-class palette, and the text and size of every label, cached per
+    (class, confidence bucket). Drawing a frame is then just OpenCV rectangle and
+    text calls on the caller's buffer, with no PIL copy or color conversion.
+    """
+
+    def __init__(self, num_classes=80, font_scale=0.6, box_thickness=3, text_thickness=1, conf_bucket=0.01):
+        """
+        Args:
+            num_classes (int): Size of the palette (use len(model.names)).
+            font_scale (float): OpenCV font scale for labels.
+            box_thickness (int): Bounding box line width in pixels.
+            text_thickness (int): Label stroke width in pixels.
+            conf_bucket (float): Confidence resolution of the label cache (0.01 matches the 2-digit label).
+        """
+        self.font = cv2.FONT_HERSHEY_SIMPLEX
+        self.font_scale = font_scale
+        self.box_thickness = box_thickness
+        self.text_thickness = text_thickness
+        self.conf_bucket = conf_bucket
+        self.palette = build_palette(num_classes)
+        self._label_cache = {}
+
+    def _label(self, class_id, class_name, confidence):
+        """Return (text, width, height, baseline) for a label, measuring each one only once"""
+        key = (class_id, int(round(confidence / self.conf_bucket)))
+        label = self._label_cache.get(key)
+        if label is None:
+            text = f"{class_name} ({key[1] * self.conf_bucket:.2f})"
+            (width, height), baseline = cv2.getTextSize(text, self.font, self.font_scale, self.text_thickness)
+            label = (text, width, height, baseline)
+            self._label_cache[key] = label
+        return label
+
+    def color(self, class_id, rgb=False):
+        color = self.palette[class_id % len(self.palette)]
+        return color[::-1] if rgb else color
+
+    def draw(self, image, detections_data, rgb=False):
+        """
+        Draw boxes and labels onto image in place.
+
+        Args:
+            image (numpy.ndarray): H x W x 3 uint8 image, BGR unless rgb=True.
+            detections_data (dict): Detection data as produced by ObjectDetector._parse_detections.
+            rgb (bool): Set when the buffer is RGB (e.g. np.array of a PIL image).
+
+        Returns:
+            numpy.ndarray: The same image object, for chaining.
+        """
+        for det in detections_data['detections']:
+            x1, y1, x2, y2 = det['box_coordinates']
+            color = self.color(det['class_id'], rgb)
+
+            cv2.rectangle(image, (x1, y1), (x2, y2), color, self.box_thickness)
+
+            text, width, height, baseline = self._label(det['class_id'], det['class_name'], det['confidence'])
+            # Keep the label inside the image when the box touches the top edge
+            top = y1 - height - baseline - 4 if y1 - height - baseline - 4 >= 0 else y1
+            cv2.rectangle(image, (x1, top), (x1 + width + 4, top + height + baseline + 4), color, cv2.FILLED)
+            cv2.putText(image, text, (x1 + 2, top + height + 2), self.font, self.font_scale,
+                        (255, 255, 255), self.text_thickness, cv2.LINE_AA)
+
+        return image
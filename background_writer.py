@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Background writer for file output
+Moves image encoding and report writing off latency-sensitive threads
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+class BackgroundWriter:
+    """
+    Runs write jobs on a worker thread with a bounded backlog.
+
+    By default submit() never blocks: when the backlog is full the oldest pending
+    job is dropped to make room, so a slow disk costs saved frames rather than
+    stalling the caller. With drop_oldest=False nothing is ever dropped and submit()
+    waits for room instead, for saves the user explicitly asked for. Counters for
+    written, dropped and failed jobs are kept for stats.
+    """
+
+    def __init__(self, max_backlog=32, name="background-writer", drop_oldest=True):
+        """
+        Args:
+            max_backlog (int): Maximum number of pending jobs.
+            name (str): Name of the worker thread.
+            drop_oldest (bool): Drop the oldest pending job when full (False: wait for room).
+        """
+        self.max_backlog = max_backlog
+        self.drop_oldest = drop_oldest
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+        self._jobs = deque()
+        self._condition = threading.Condition()
+        self._closed = False
+        self._busy = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Queue fn(*args, **kwargs) to run on the writer thread.
+
+        Returns:
+            bool: False if the writer is closed, True otherwise (even if an older job was dropped).
+        """
+        with self._condition:
+            if self._closed:
+                return False
+            if len(self._jobs) >= self.max_backlog:
+                if self.drop_oldest:
+                    self._jobs.popleft()
+                    self.dropped += 1
+                else:
+                    self._condition.wait_for(lambda: len(self._jobs) < self.max_backlog or self._closed)
+                    if self._closed:
+                        return False
+            self._jobs.append((fn, args, kwargs))
+            self._condition.notify_all()
+        return True
+
+    @property
+    def backlog(self):
+        return len(self._jobs)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._jobs and not self._closed:
+                    self._condition.wait()
+                if not self._jobs:
+                    return
+                fn, args, kwargs = self._jobs.popleft()
+                self._busy = True
+                self._condition.notify_all()
+
+            try:
+                fn(*args, **kwargs)
+                self.written += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"Background write failed: {e}")
+            finally:
+                with self._condition:
+                    self._busy = False
+                    self._condition.notify_all()
+
+    def flush(self, timeout=None):
+        """Wait until every queued job has run. Returns False on timeout."""
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._jobs and not self._busy, timeout)
+
+    def close(self, wait=True, timeout=10):
+        """
+        Stop accepting jobs. With wait=True, finish the pending ones first (up to
+        timeout seconds); with wait=False, drop them and only finish the running one.
+
+        Returns:
+            bool: True once the writer thread has exited, i.e. no job is still running.
+        """
+        with self._condition:
+            self._closed = True
+            if not wait:
+                self.dropped += len(self._jobs)
+                self._jobs.clear()
+            self._condition.notify_all()
+        self._thread.join(timeout if wait else None)
+        return not self._thread.is_alive()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+class RetainedDirectory:
+    """
+    Keeps a directory of generated files within a count and age limit.
+
+    Files already in the directory are indexed once at startup; after that every
+    file written through add() is tracked in order, and the oldest ones are deleted
+    as soon as the directory holds more than max_files or they are older than
+    max_age seconds, without rescanning the directory.
+    """
+
+    def __init__(self, path, max_files=None, max_age=None):
+        """
+        Args:
+            path (str or Path): Directory to manage (created if missing).
+            max_files (int): Most files kept (None for no limit).
+            max_age (float): Seconds a file is kept (None for no limit).
+        """
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.max_files = max_files
+        self.max_age = max_age
+        self.deleted = 0
+
+        self._lock = threading.Lock()
+        existing = []
+        with os.scandir(self.path) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    existing.append((entry.stat().st_mtime, Path(entry.path)))
+        self._files = deque(sorted(existing))
+        self.prune()
+
+    def add(self, path):
+        """Track a newly written file and apply the limits"""
+        with self._lock:
+            self._files.append((time.time(), Path(path)))
+        self.prune()
+
+    def prune(self):
+        """Delete the oldest tracked files beyond max_files or older than max_age"""
+        with self._lock:
+            cutoff = time.time() - self.max_age if self.max_age is not None else None
+            while self._files:
+                written, path = self._files[0]
+                over_count = self.max_files is not None and len(self._files) > self.max_files
+                expired = cutoff is not None and written < cutoff
+                if not (over_count or expired):
+                    break
+                self._files.popleft()
+                try:
+                    path.unlink()
+                    self.deleted += 1
+                except FileNotFoundError:
+                    pass
+
+    def __len__(self):
+        return len(self._files)
@@ -10,9 +10,132 @@ import argparse
 import cv2
 import json
 import time
+import queue
+import hashlib
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
 from datetime import datetime
 from ultralytics import YOLO
+from config_manager import ConfigManager
+from detection_store import DETECTION_FORMATS, DETECTION_WRITERS, detection_output_path, open_detection_writer
+from detection_utils import result_to_array, to_report_detections
+
+class ProcessedManifest:
+    """
+    Append-only JSON Lines record of images already processed into an output directory.
+    
+    Entries are keyed by resolved path and store size and mtime (plus a SHA-256 of the
+    content when content_hash is enabled), so reruns skip unchanged files and a crashed
+    run resumes where it stopped. Each entry also carries the run fingerprint (see
+    run_fingerprint), so files processed with another model, confidence or output
+    settings count as not processed. Worker processes append to their own
+    processed_manifest.<writer>.jsonl file; compact() folds them into the main file.
+    """
+    
+    MANIFEST_NAME = "processed_manifest"
+    
+    def __init__(self, output_path, content_hash=False, writer_name=None, load_existing=True, run=None):
+        self.output_path = Path(output_path)
+        self.content_hash = content_hash
+        self.run = run
+        suffix = f".{writer_name}" if writer_name else ""
+        self.manifest_path = self.output_path / f"{self.MANIFEST_NAME}{suffix}.jsonl"
+        self.entries = {}
+        self._lock = threading.Lock()
+        if load_existing:
+            self.load()
+    
+    def _manifest_files(self):
+        return sorted(self.output_path.glob(f"{self.MANIFEST_NAME}*.jsonl"))
+    
+    def load(self):
+        """Read every manifest file in the output directory, later lines winning"""
+        for path in self._manifest_files():
+            with open(path, 'r') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A crash mid-write can leave a truncated last line
+                        continue
+                    self.entries[entry["path"]] = entry
+        return self.entries
+    
+    @staticmethod
+    def run_fingerprint(model_path, confidence, **settings):
+        """
+        Short hash of everything that changes a run's outputs: the model (path plus the
+        weights file's size and mtime, so retrained weights count), the confidence and
+        the output settings.
+        """
+        model = {"path": str(model_path)}
+        if os.path.exists(model_path):
+            stat = os.stat(model_path)
+            model.update(path=str(Path(model_path).resolve()), size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        key = json.dumps({"model": model, "confidence": confidence, "settings": settings}, sort_keys=True)
+        return hashlib.sha1(key.encode()).hexdigest()[:16]
+    
+    @staticmethod
+    def _hash_file(path):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    def fingerprint(self, path, stat=None):
+        """Return the manifest entry describing the file as it is on disk now"""
+        stat = stat or os.stat(path)
+        entry = {
+            "path": str(Path(path).resolve()),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns
+        }
+        if self.content_hash:
+            entry["sha256"] = self._hash_file(path)
+        return entry
+    
+    def is_processed(self, path, stat=None):
+        """True if the file was processed by this run configuration and matches by size and mtime, or by content hash"""
+        stat = stat or os.stat(path)
+        entry = self.entries.get(str(Path(path).resolve()))
+        if entry is None or entry.get("run") != self.run:
+            return False
+        if entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return True
+        # Touched or copied files keep their content; only hash when the cheap check fails
+        if self.content_hash and entry.get("sha256") and entry["size"] == stat.st_size:
+            return entry["sha256"] == self._hash_file(path)
+        return False
+    
+    def record(self, path, summary_entry=None):
+        """Append a processed file; flushed immediately so a crash loses at most one line"""
+        entry = self.fingerprint(path)
+        entry["run"] = self.run
+        entry["processed_at"] = datetime.now().isoformat()
+        if summary_entry is not None:
+            entry["objects_found"] = summary_entry.get("objects_found", 0)
+        line = json.dumps(entry) + "\n"
+        with self._lock:
+            with open(self.manifest_path, 'a') as f:
+                f.write(line)
+            self.entries[entry["path"]] = entry
+    
+    def compact(self):
+        """Merge all manifest files into a single deduplicated processed_manifest.jsonl"""
+        with self._lock:
+            self.entries = {}
+            self.load()
+            main_path = self.output_path / f"{self.MANIFEST_NAME}.jsonl"
+            tmp_path = main_path.with_suffix(".jsonl.tmp")
+            with open(tmp_path, 'w') as f:
+                for entry in self.entries.values():
+                    f.write(json.dumps(entry) + "\n")
+            os.replace(tmp_path, main_path)
+            for path in self._manifest_files():
+                if path != main_path:
+                    path.unlink()
 
 class BatchProcessor:
     def __init__(self, model_path="yolov8n.pt", confidence=0.25):
@@ -23,97 +146,292 @@ class BatchProcessor:
         self.supported_image_formats = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp'}
         self.supported_video_formats = {'.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv'}
         
-    def process_images_batch(self, input_dir, output_dir, save_annotated=True, save_json=True):
-        """Process all images in a directory"""
+    def _extract_detections(self, result, data=None):
+        """Convert a result's boxes (or its result_to_array data) into the report's detection dicts"""
+        if data is None:
+            data = result_to_array(result)
+        return to_report_detections(data, self.model.names)
+    
+    def _save_result(self, img_file, result, output_path, save_annotated=True, save_json=True, data=None):
+        """Write the annotated image and JSON report for one result, return its detection data"""
+        # Prepare file names
+        base_name = img_file.stem
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        
+        # Save annotated image
+        if save_annotated:
+            annotated_path = output_path / f"{base_name}_detected.jpg"
+            annotated_img = result.plot()
+            cv2.imwrite(str(annotated_path), annotated_img)
+        
+        # Prepare detection data
+        detections = self._extract_detections(result, data)
+        detection_data = {
+            "timestamp": timestamp,
+            "source_file": str(img_file),
+            "model_used": self.model_path,
+            "confidence_threshold": self.confidence,
+            "objects_detected": len(detections),
+            "detections": detections
+        }
+        
+        # Save JSON report
+        if save_json:
+            json_path = output_path / f"{base_name}_report.json"
+            with open(json_path, 'w') as f:
+                json.dump(detection_data, f, indent=2)
+        
+        return detection_data
+    
+    def _summarize(self, img_file, detection_data=None, error=None):
+        """Build the batch summary entry for one image"""
+        if error is not None:
+            print(f"   ❌ Error processing {img_file.name}: {error}")
+            return {
+                "file": img_file.name,
+                "objects_found": 0,
+                "error": error
+            }
+        
+        print(f"   ✅ {img_file.name}: found {detection_data['objects_detected']} objects")
+        return {
+            "file": img_file.name,
+            "objects_found": detection_data["objects_detected"],
+            "top_detection": detection_data["detections"][0]["class"] if detection_data["detections"] else "None"
+        }
+    
+    def _write_result(self, img_file, result, output_path, save_annotated, save_json, manifest=None,
+                      detection_writer=None, image_id=0):
+        """Writer stage: annotate, encode and report one result, return its summary entry"""
+        try:
+            data = result_to_array(result)
+            detection_data = self._save_result(img_file, result, output_path, save_annotated, save_json, data)
+            if detection_writer is not None:
+                detection_writer.add(image_id, img_file, data)
+            summary_entry = self._summarize(img_file, detection_data)
+        except Exception as e:
+            return self._summarize(img_file, error=str(e))
+        
+        # Only successful images go in the manifest so failures are retried next run
+        if manifest is not None:
+            manifest.record(img_file, summary_entry)
+        return summary_entry
+    
+    def process_files(self, image_files, output_path, save_annotated=True, save_json=True, batch_size=1,
+                      decode_workers=4, write_workers=4, queue_depth=4, manifest=None,
+                      detection_writer=None, image_id_offset=0):
+        """
+        Run image files through a three-stage decode / infer / write pipeline.
+        
+        A pool of decode threads keeps up to queue_depth batches ready ahead of the
+        model, inference runs on the calling thread, and a pool of writer threads
+        handles annotation, JPEG encoding and JSON reports behind it. Both queues are
+        bounded, so memory is capped at roughly 2 * queue_depth * batch_size images.
+        Successfully written images are recorded in the manifest, if one is given, and
+        their detections streamed to detection_writer with image_id_offset + index as id.
+        Returns the per-image summary entries in input order.
+        """
+        decode_queue = queue.Queue(maxsize=queue_depth)
+        write_slots = threading.BoundedSemaphore(queue_depth * batch_size)
+        stop_event = threading.Event()
+        
+        def producer():
+            try:
+                with ThreadPoolExecutor(max_workers=decode_workers, thread_name_prefix="decode") as decode_pool:
+                    for batch_start in range(0, len(image_files), batch_size):
+                        if stop_event.is_set():
+                            break
+                        batch_files = image_files[batch_start:batch_start + batch_size]
+                        images = list(decode_pool.map(lambda f: cv2.imread(str(f)), batch_files))
+                        decode_queue.put((batch_start, batch_files, images))
+            finally:
+                decode_queue.put(None)
+        
+        producer_thread = threading.Thread(target=producer, name="batch-decoder", daemon=True)
+        producer_thread.start()
+        
+        # One slot per image so the summary keeps input order regardless of writer timing
+        pending = [None] * len(image_files)
+        
+        def release_slot(_future):
+            write_slots.release()
+        
+        try:
+            with ThreadPoolExecutor(max_workers=write_workers, thread_name_prefix="writer") as write_pool:
+                while True:
+                    item = decode_queue.get()
+                    if item is None:
+                        break
+                    batch_start, batch_files, images = item
+                    
+                    loaded = []
+                    for offset, (img_file, img) in enumerate(zip(batch_files, images)):
+                        if img is None:
+                            pending[batch_start + offset] = self._summarize(img_file, error="could not decode image")
+                        else:
+                            loaded.append((batch_start + offset, img_file, img))
+                    
+                    if not loaded:
+                        continue
+                    
+                    print(f"🔍 Processing {batch_start + 1}-{batch_start + len(batch_files)}/{len(image_files)}")
+                    
+                    try:
+                        # Run detection on the stacked batch (the predictor letterboxes to a common shape)
+                        results = self.model([img for _, _, img in loaded], conf=self.confidence, verbose=False)
+                    except Exception as e:
+                        for index, img_file, _ in loaded:
+                            pending[index] = self._summarize(img_file, error=str(e))
+                        continue
+                    
+                    for (index, img_file, _), result in zip(loaded, results):
+                        write_slots.acquire()
+                        future = write_pool.submit(self._write_result, img_file, result, output_path,
+                                                   save_annotated, save_json, manifest,
+                                                   detection_writer, image_id_offset + index)
+                        future.add_done_callback(release_slot)
+                        pending[index] = future
+        finally:
+            stop_event.set()
+            # Drain so a blocked producer can observe the stop flag and exit
+            while producer_thread.is_alive():
+                try:
+                    decode_queue.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+        
+        return [entry.result() if isinstance(entry, Future) else entry for entry in pending]
+    
+    def process_files_parallel(self, image_files, output_path, max_workers=4, manifest=None,
+                               detections_output=None, **pipeline_options):
+        """
+        Shard image files across a pool of worker processes and merge their summaries.
+        
+        Each worker loads the model once and pins torch to its share of the CPU cores,
+        so the shards run side by side instead of competing for the same threads.
+        With a manifest, each worker appends to its own manifest file as it goes.
+        detections_output is an (output_format, run_name) pair; each worker streams to its
+        own part file and the parts are concatenated in input order at the end.
+        Summary entries are returned in input order.
+        """
+        max_workers = max(1, min(max_workers, len(image_files)))
+        threads_per_worker = max(1, (os.cpu_count() or 1) // max_workers)
+        shard_size = (len(image_files) + max_workers - 1) // max_workers
+        shards = [image_files[i:i + shard_size] for i in range(0, len(image_files), shard_size)]
+        
+        print(f"🧵 Sharding across {len(shards)} worker processes ({threads_per_worker} torch threads each)")
+        
+        content_hash = manifest.content_hash if manifest is not None else None
+        run = manifest.run if manifest is not None else None
+        shard_summaries = [None] * len(shards)
+        with ProcessPoolExecutor(max_workers=len(shards)) as executor:
+            futures = {
+                executor.submit(_process_shard, self.model_path, self.confidence, shard, output_path,
+                                threads_per_worker, pipeline_options, content_hash, shard_index,
+                                detections_output, shard_index * shard_size, run): shard_index
+                for shard_index, shard in enumerate(shards)
+            }
+            for future in as_completed(futures):
+                shard_index = futures[future]
+                shard = shards[shard_index]
+                try:
+                    shard_summaries[shard_index] = future.result()
+                    print(f"   🧩 Worker {shard_index + 1}/{len(shards)} finished {len(shard)} images")
+                except Exception as e:
+                    print(f"   ❌ Worker {shard_index + 1}/{len(shards)} failed: {str(e)}")
+                    shard_summaries[shard_index] = [
+                        {"file": img_file.name, "objects_found": 0, "error": str(e)} for img_file in shard
+                    ]
+        
+        if detections_output is not None:
+            output_format, run_name = detections_output
+            part_paths = [detection_output_path(output_path, run_name, output_format, part=shard_index)
+                          for shard_index in range(len(shards))]
+            DETECTION_WRITERS[output_format].concatenate(
+                [part for part in part_paths if part.exists()],
+                detection_output_path(output_path, run_name, output_format)
+            )
+        
+        return [entry for summary in shard_summaries for entry in summary]
+    
+    def process_images_batch(self, input_dir, output_dir, save_annotated=True, save_json=True, batch_size=1,
+                             decode_workers=4, write_workers=4, queue_depth=4, parallel=False, max_workers=4,
+                             resume=True, content_hash=False, output_format="json"):
+        """
+        Process all images in a directory through the pipelined decode / infer / write stages.
+        
+        With parallel=True the file list is sharded across max_workers processes.
+        With resume=True, images already recorded in the output directory's manifest
+        are skipped, so reruns only send new or changed files to the model.
+        output_format "json" writes one report per image; "jsonl", "npy" or "parquet"
+        stream every detection of the run into a single detections_<timestamp> output.
+        """
         input_path = Path(input_dir)
         output_path = Path(output_dir)
         output_path.mkdir(exist_ok=True)
         
-        # Find all image files
+        manifest = None
+        if resume:
+            run = ProcessedManifest.run_fingerprint(self.model_path, self.confidence, save_annotated=save_annotated,
+                                                    save_json=save_json, output_format=output_format)
+            manifest = ProcessedManifest(output_path, content_hash, run=run)
+        
+        # Find all image files in a single directory scan
         image_files = []
-        for ext in self.supported_image_formats:
-            image_files.extend(input_path.glob(f"*{ext}"))
-            image_files.extend(input_path.glob(f"*{ext.upper()}"))
+        skipped_files = 0
+        with os.scandir(input_path) as entries:
+            for entry in entries:
+                if not entry.is_file() or Path(entry.name).suffix.lower() not in self.supported_image_formats:
+                    continue
+                if manifest is not None and manifest.is_processed(entry.path, entry.stat()):
+                    skipped_files += 1
+                    continue
+                image_files.append(Path(entry.path))
+        image_files.sort()
         
         if not image_files:
-            print(f"❌ No image files found in {input_dir}")
+            if skipped_files:
+                print(f"✅ All {skipped_files} images in {input_dir} are already processed")
+            else:
+                print(f"❌ No image files found in {input_dir}")
             return
         
+        if skipped_files:
+            print(f"⏭️  Skipping {skipped_files} images already in the manifest")
         print(f"📁 Found {len(image_files)} images to process")
         print(f"🎯 Using model: {self.model_path}")
+        print(f"📦 Batch size: {batch_size}")
         print(f"📤 Output directory: {output_dir}")
         print("-" * 50)
         
-        results_summary = []
         start_time = time.time()
         
-        for i, img_file in enumerate(image_files, 1):
-            print(f"🔍 Processing {i}/{len(image_files)}: {img_file.name}")
-            
-            try:
-                # Run detection
-                results = self.model(str(img_file), conf=self.confidence)
-                result = results[0]
-                
-                # Prepare file names
-                base_name = img_file.stem
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                
-                # Save annotated image
-                if save_annotated:
-                    annotated_path = output_path / f"{base_name}_detected.jpg"
-                    annotated_img = result.plot()
-                    cv2.imwrite(str(annotated_path), annotated_img)
-                
-                # Prepare detection data
-                detection_data = {
-                    "timestamp": timestamp,
-                    "source_file": str(img_file),
-                    "model_used": self.model_path,
-                    "confidence_threshold": self.confidence,
-                    "objects_detected": len(result.boxes) if result.boxes is not None else 0,
-                    "detections": []
-                }
-                
-                # Process each detection
-                if result.boxes is not None:
-                    for box in result.boxes:
-                        class_id = int(box.cls[0])
-                        confidence = float(box.conf[0])
-                        class_name = self.model.names[class_id]
-                        bbox = box.xyxy[0].tolist()
-                        
-                        detection_data["detections"].append({
-                            "class": class_name,
-                            "confidence": confidence,
-                            "bbox": {
-                                "x1": bbox[0], "y1": bbox[1],
-                                "x2": bbox[2], "y2": bbox[3]
-                            }
-                        })
-                
-                # Save JSON report
-                if save_json:
-                    json_path = output_path / f"{base_name}_report.json"
-                    with open(json_path, 'w') as f:
-                        json.dump(detection_data, f, indent=2)
-                
-                # Add to summary
-                results_summary.append({
-                    "file": img_file.name,
-                    "objects_found": detection_data["objects_detected"],
-                    "top_detection": detection_data["detections"][0]["class"] if detection_data["detections"] else "None"
-                })
-                
-                print(f"   ✅ Found {detection_data['objects_detected']} objects")
-                
-            except Exception as e:
-                print(f"   ❌ Error processing {img_file.name}: {str(e)}")
-                results_summary.append({
-                    "file": img_file.name,
-                    "objects_found": 0,
-                    "error": str(e)
-                })
+        detections_output = None
+        detections_path = None
+        if save_json and output_format != "json":
+            detections_output = (output_format, f"detections_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+            detections_path = detection_output_path(output_path, detections_output[1], output_format)
+        
+        pipeline_options = {
+            "save_annotated": save_annotated,
+            "save_json": save_json and detections_output is None,
+            "batch_size": batch_size,
+            "decode_workers": decode_workers,
+            "write_workers": write_workers,
+            "queue_depth": queue_depth
+        }
+        
+        if parallel and max_workers > 1 and len(image_files) > 1:
+            results_summary = self.process_files_parallel(image_files, output_path, max_workers, manifest=manifest,
+                                                          detections_output=detections_output, **pipeline_options)
+            if manifest is not None:
+                manifest.compact()
+        elif detections_output is not None:
+            with open_detection_writer(output_format, detections_path) as detection_writer:
+                results_summary = self.process_files(image_files, output_path, manifest=manifest,
+                                                     detection_writer=detection_writer, **pipeline_options)
+        else:
+            results_summary = self.process_files(image_files, output_path, manifest=manifest, **pipeline_options)
         
         # Save batch summary
         end_time = time.time()
@@ -122,10 +440,14 @@ class BatchProcessor:
         batch_summary = {
             "timestamp": datetime.now().isoformat(),
             "total_images": len(image_files),
+            "skipped_images": skipped_files,
             "processing_time_seconds": total_time,
             "average_time_per_image": total_time / len(image_files),
             "model_used": self.model_path,
             "confidence_threshold": self.confidence,
+            "batch_size": batch_size,
+            "parallel_workers": max_workers if parallel else 1,
+            "detections_output": str(detections_path) if detections_path is not None else None,
             "results": results_summary
         }
         
@@ -135,13 +457,218 @@ class BatchProcessor:
         
         # Print summary
         print("-" * 50)
-        print(f"🎉 Batch processing complete!")
+        print("🎉 Batch processing complete!")
         print(f"📊 Processed {len(image_files)} images in {total_time:.1f} seconds")
         print(f"⚡ Average: {total_time/len(image_files):.2f} seconds per image")
         print(f"📄 Summary saved to: {summary_path}")
         
         return batch_summary
 
+    def _read_video_frames(self, cap, frame_interval, batch_size, frame_queue, stop_event, progress):
+        """Reader thread: push batches of every frame_interval-th frame onto frame_queue"""
+        frame_index = 0
+        try:
+            batch = []
+            while not stop_event.is_set():
+                if frame_index % frame_interval == 0:
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    batch.append((frame_index, frame))
+                    if len(batch) == batch_size:
+                        frame_queue.put(batch)
+                        batch = []
+                else:
+                    # grab() skips the decode for frames we are not going to sample
+                    if not cap.grab():
+                        break
+                frame_index += 1
+            if batch:
+                frame_queue.put(batch)
+        finally:
+            progress["frames_read"] = frame_index
+            frame_queue.put(None)
+    
+    def process_video(self, video_path, output_dir, frame_interval=30, batch_size=1,
+                      save_annotated=True, save_json=True, queue_depth=4):
+        """
+        Run detection on a video as a streaming frame pipeline.
+        
+        A background reader samples every frame_interval-th frame into a bounded queue,
+        sampled frames are batched into the model, and results are streamed straight to
+        an annotated MP4 and a JSON Lines file with one record per sampled frame, so the
+        video is never held in memory.
+        """
+        video_path = Path(video_path)
+        output_path = Path(output_dir)
+        output_path.mkdir(exist_ok=True)
+        
+        if video_path.suffix.lower() not in self.supported_video_formats:
+            print(f"❌ Unsupported video format: {video_path.suffix}")
+            return
+        
+        cap = cv2.VideoCapture(str(video_path))
+        if not cap.isOpened():
+            print(f"❌ Could not open video: {video_path}")
+            return
+        
+        source_fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        frame_interval = max(1, frame_interval)
+        
+        print(f"🎬 Processing video: {video_path.name}")
+        print(f"🎯 Using model: {self.model_path}")
+        print(f"📹 Source: {total_frames} frames at {source_fps:.1f} FPS, sampling every {frame_interval} frame(s)")
+        print(f"📤 Output directory: {output_dir}")
+        print("-" * 50)
+        
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        annotated_path = output_path / f"{video_path.stem}_detected.mp4"
+        detections_path = output_path / f"{video_path.stem}_detections.jsonl"
+        writer = None
+        detections_file = open(detections_path, 'w') if save_json else None
+        
+        frame_queue = queue.Queue(maxsize=queue_depth)
+        stop_event = threading.Event()
+        progress = {"frames_read": 0}
+        reader = threading.Thread(
+            target=self._read_video_frames,
+            args=(cap, frame_interval, batch_size, frame_queue, stop_event, progress),
+            name="video-reader",
+            daemon=True
+        )
+        
+        frames_sampled = 0
+        objects_total = 0
+        last_frame_index = -1
+        start_time = time.time()
+        reader.start()
+        
+        try:
+            while True:
+                batch = frame_queue.get()
+                if batch is None:
+                    break
+                
+                results = self.model([frame for _, frame in batch], conf=self.confidence, verbose=False)
+                
+                for (frame_index, _), result in zip(batch, results):
+                    detections = self._extract_detections(result)
+                    frames_sampled += 1
+                    objects_total += len(detections)
+                    last_frame_index = frame_index
+                    
+                    if save_annotated:
+                        annotated_frame = result.plot()
+                        if writer is None:
+                            height, width = annotated_frame.shape[:2]
+                            writer = cv2.VideoWriter(
+                                str(annotated_path),
+                                cv2.VideoWriter_fourcc(*"mp4v"),
+                                max(1.0, source_fps / frame_interval),
+                                (width, height)
+                            )
+                        writer.write(annotated_frame)
+                    
+                    if detections_file is not None:
+                        detections_file.write(json.dumps({
+                            "frame_index": frame_index,
+                            "timestamp_seconds": round(frame_index / source_fps, 3),
+                            "objects_detected": len(detections),
+                            "detections": detections
+                        }) + "\n")
+                
+                print(f"🔍 Frame {last_frame_index + 1}/{total_frames or '?'}: {frames_sampled} sampled, {objects_total} objects")
+        finally:
+            stop_event.set()
+            while reader.is_alive():
+                try:
+                    frame_queue.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            cap.release()
+            if writer is not None:
+                writer.release()
+            if detections_file is not None:
+                detections_file.close()
+        
+        total_time = time.time() - start_time
+        frames_covered = progress["frames_read"]
+        source_frames_per_second = frames_covered / total_time if total_time > 0 else 0.0
+        
+        video_summary = {
+            "timestamp": datetime.now().isoformat(),
+            "source_file": str(video_path),
+            "model_used": self.model_path,
+            "confidence_threshold": self.confidence,
+            "batch_size": batch_size,
+            "frame_interval": frame_interval,
+            "source_fps": source_fps,
+            "source_frames": frames_covered,
+            "frames_sampled": frames_sampled,
+            "objects_detected": objects_total,
+            "processing_time_seconds": total_time,
+            "sampled_frames_per_second": frames_sampled / total_time if total_time > 0 else 0.0,
+            "source_frames_per_second": source_frames_per_second,
+            "realtime_factor": source_frames_per_second / source_fps if source_fps else 0.0,
+            "annotated_video": str(annotated_path) if writer is not None else None,
+            "detections_file": str(detections_path) if save_json else None
+        }
+        
+        summary_path = output_path / f"video_summary_{video_path.stem}_{timestamp}.json"
+        with open(summary_path, 'w') as f:
+            json.dump(video_summary, f, indent=2)
+        
+        print("-" * 50)
+        print("🎉 Video processing complete!")
+        print(f"📊 Sampled {frames_sampled} of {frames_covered} frames in {total_time:.1f} seconds")
+        print(f"⚡ Throughput: {video_summary['source_frames_per_second']:.1f} source FPS "
+              f"({video_summary['realtime_factor']:.2f}x realtime, source is {source_fps:.1f} FPS)")
+        print(f"📄 Summary saved to: {summary_path}")
+        
+        return video_summary
+
+def _process_shard(model_path, confidence, image_files, output_path, num_threads, pipeline_options,
+                   content_hash=None, shard_index=0, detections_output=None, image_id_offset=0, run=None):
+    """Worker process entry point: load the model once and run one shard through the pipeline"""
+    import torch
+    torch.set_num_threads(num_threads)
+    
+    manifest = None
+    if content_hash is not None:
+        manifest = ProcessedManifest(output_path, content_hash, writer_name=f"worker{shard_index}",
+                                     load_existing=False, run=run)
+    
+    processor = BatchProcessor(model_path, confidence)
+    if detections_output is None:
+        return processor.process_files(image_files, output_path, manifest=manifest, **pipeline_options)
+    
+    output_format, run_name = detections_output
+    part_path = detection_output_path(output_path, run_name, output_format, part=shard_index)
+    with open_detection_writer(output_format, part_path) as detection_writer:
+        return processor.process_files(image_files, output_path, manifest=manifest, detection_writer=detection_writer,
+                                       image_id_offset=image_id_offset, **pipeline_options)
+
+def load_run_config(config_name=None, config_dir="configs"):
+    """
+    Settings for a run: the named preset, else configs/default.json if it exists.
+    
+    The default is read directly rather than through ConfigManager, which creates
+    configs/ and default.json wherever the script is run.
+    """
+    if config_name:
+        return ConfigManager(config_dir).load_config(config_name)
+    
+    default_path = Path(config_dir) / "default.json"
+    if not default_path.exists():
+        return {}
+    try:
+        with open(default_path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️  Could not read {default_path}: {e}")
+        return {}
+
 def main():
     parser = argparse.ArgumentParser(description="Batch Object Detection")
     parser.add_argument("--input", type=str, required=True, help="Input directory (for images) or file path (for video)")
@@ -151,9 +678,33 @@ def main():
     parser.add_argument("--mode", choices=["images", "video"], default="images", help="Processing mode")
     parser.add_argument("--no-annotated", action="store_true", help="Skip saving annotated images")
     parser.add_argument("--no-json", action="store_true", help="Skip saving JSON reports")
+    parser.add_argument("--output-format", choices=("json",) + DETECTION_FORMATS, default="json",
+                        help="json: one report per image; jsonl/npy/parquet: one consolidated detections file")
+    parser.add_argument("--batch-size", type=int, default=1, help="Number of images per inference call")
+    parser.add_argument("--decode-workers", type=int, default=4, help="Threads decoding images ahead of the model")
+    parser.add_argument("--write-workers", type=int, default=4, help="Threads writing annotated images and reports")
+    parser.add_argument("--queue-depth", type=int, default=4, help="Decoded batches buffered ahead of the model")
+    parser.add_argument("--frame-interval", type=int, default=None,
+                        help="Process every Nth video frame (defaults to video.frame_interval from the config, else 30)")
+    parser.add_argument("--parallel", action="store_true", default=None,
+                        help="Shard images across worker processes (defaults to batch.parallel_processing from the config)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Number of worker processes (defaults to batch.max_workers from the config, else 4)")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="Reprocess every image instead of skipping ones recorded in the output manifest")
+    parser.add_argument("--content-hash", action="store_true",
+                        help="Also match manifest entries by SHA-256 so touched or copied files are not reprocessed")
+    parser.add_argument("--config", type=str,
+                        help="Configuration preset to read defaults from (default: configs/default.json if present)")
     
     args = parser.parse_args()
     
+    # Explicit flags override the config
+    config = load_run_config(args.config)
+    batch_config = config.get("batch", {})
+    parallel = args.parallel if args.parallel is not None else batch_config.get("parallel_processing", False)
+    max_workers = args.workers if args.workers is not None else batch_config.get("max_workers", 4)
+    
     processor = BatchProcessor(args.model, args.confidence)
     
     if args.mode == "images":
@@ -161,7 +712,30 @@ def main():
             args.input, 
             args.output,
             save_annotated=not args.no_annotated,
-            save_json=not args.no_json
+            save_json=not args.no_json,
+            batch_size=max(1, args.batch_size),
+            decode_workers=max(1, args.decode_workers),
+            write_workers=max(1, args.write_workers),
+            queue_depth=max(1, args.queue_depth),
+            parallel=parallel,
+            max_workers=max(1, max_workers),
+            resume=not args.no_resume,
+            content_hash=args.content_hash,
+            output_format=args.output_format
+        )
+    elif args.mode == "video":
+        frame_interval = args.frame_interval
+        if frame_interval is None:
+            frame_interval = config.get("video", {}).get("frame_interval", 30)
+        
+        processor.process_video(
+            args.input,
+            args.output,
+            frame_interval=frame_interval,
+            batch_size=max(1, args.batch_size),
+            save_annotated=not args.no_annotated,
+            save_json=not args.no_json,
+            queue_depth=max(1, args.queue_depth)
         )
 
 if __name__ == "__main__":
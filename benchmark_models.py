@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Speed / accuracy benchmark across model sizes, input resolutions and batch sizes
+================================================================================
+
+Sweeps the local yolov8*.pt weights x imgsz x batch size on the CPU, measuring
+throughput, p50/p95 batch latency and peak RSS, pairs each configuration with mAP from a
+local labeled dataset, and writes a JSON / CSV report plus the Pareto frontier
+(the configurations no other configuration beats on both speed and accuracy).
+"""
+
+import argparse
+import csv
+import json
+import multiprocessing
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+def find_weights():
+    """yolov8*.pt files in models/ (or the current directory if models/ has none)"""
+    weights = sorted(str(p) for p in Path('models').glob('yolov8*.pt'))
+    if not weights:
+        weights = sorted(str(p) for p in Path('.').glob('yolov8*.pt'))
+    return weights
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB, or None if it cannot be measured"""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in KB on Linux, bytes on macOS
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    try:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+    except Exception:
+        return None
+
+def pareto_frontier(rows, accuracy_key='mAP50-95', speed_key='images_per_second'):
+    """
+    Configurations not dominated on (speed, accuracy).
+
+    Returns:
+        list: Frontier rows, fastest first.
+    """
+    candidates = [row for row in rows if row.get(accuracy_key) is not None and row.get(speed_key)]
+    candidates.sort(key=lambda row: (-row[speed_key], -row[accuracy_key]))
+    frontier = []
+    best_accuracy = -1.0
+    for row in candidates:
+        if row[accuracy_key] > best_accuracy:
+            frontier.append(row)
+            best_accuracy = row[accuracy_key]
+    return frontier
+
+def _benchmark_config(config):
+    """
+    Measure one (model, imgsz, batch size) configuration.
+
+    Runs in a fresh process per configuration so peak RSS belongs to this
+    configuration alone. Failures come back as a row with an 'error' field.
+    """
+    try:
+        return _measure_config(config)
+    except Exception as e:
+        return {'model': Path(config['model']).name, 'imgsz': config['imgsz'],
+                'batch_size': config['batch_size'], 'error': str(e)}
+
+def _measure_config(config):
+    import torch
+    from ultralytics import YOLO
+    from image_cache import ImageCache
+
+    if config['threads']:
+        torch.set_num_threads(config['threads'])
+
+    model_path, imgsz, batch_size = config['model'], config['imgsz'], config['batch_size']
+    image_cache = ImageCache(imgsz)
+    # Decode before timing; the benchmark measures the model, not JPEG decoding
+    images, _, _ = image_cache.load_batch(config['images'])
+    if not images:
+        return {'model': Path(model_path).name, 'imgsz': imgsz, 'batch_size': batch_size, 'error': 'no images'}
+
+    start_time = time.time()
+    model = YOLO(model_path)
+    load_time = time.time() - start_time
+
+    for _ in range(config['warmup']):
+        model(images[:batch_size], imgsz=imgsz, device='cpu', verbose=False)
+
+    batch_latencies = []
+    image_count = 0
+    run_start = time.time()
+    for _ in range(config['runs']):
+        for i in range(0, len(images), batch_size):
+            batch = images[i:i + batch_size]
+            start_time = time.time()
+            model(batch, imgsz=imgsz, device='cpu', verbose=False)
+            batch_latencies.append(time.time() - start_time)
+            image_count += len(batch)
+    run_time = time.time() - run_start
+
+    latency_ms = np.array(batch_latencies) * 1000
+    row = {
+        'model': Path(model_path).name,
+        'imgsz': imgsz,
+        'batch_size': batch_size,
+        'threads': torch.get_num_threads(),
+        'images': image_count,
+        'load_time': round(load_time, 3),
+        'images_per_second': round(image_count / run_time, 2) if run_time > 0 else 0.0,
+        'batch_latency_p50_ms': round(float(np.percentile(latency_ms, 50)), 2),
+        'batch_latency_p95_ms': round(float(np.percentile(latency_ms, 95)), 2),
+        'peak_rss_mb': peak_rss_mb(),
+        'precision': None,
+        'recall': None,
+        'mAP50': None,
+        'mAP50-95': None
+    }
+    if row['peak_rss_mb'] is not None:
+        row['peak_rss_mb'] = round(row['peak_rss_mb'], 1)
+
+    if config['dataset_dir']:
+        # Accuracy depends on the model and imgsz, not the batch size
+        from train_model import ModelEvaluator
+        accuracy = ModelEvaluator().evaluate_accuracy(model_path, config['dataset_dir'], config['split'],
+                                                      batch_size=batch_size, image_cache=image_cache, model=model)
+        if accuracy:
+            for key in ('precision', 'recall', 'mAP50', 'mAP50-95'):
+                row[key] = round(accuracy[key], 4)
+    return row
+
+def run_benchmark(weights, imgsz_list, batch_sizes, images, dataset_dir=None, split='test',
+                  runs=3, warmup=2, threads=None):
+    """
+    Benchmark every configuration, each in its own process.
+
+    Returns:
+        list: One result row per (model, imgsz, batch size).
+    """
+    configs = []
+    for model_path in weights:
+        for imgsz in imgsz_list:
+            for index, batch_size in enumerate(batch_sizes):
+                configs.append({
+                    'model': model_path,
+                    'imgsz': imgsz,
+                    'batch_size': batch_size,
+                    'images': [str(p) for p in images],
+                    'runs': runs,
+                    'warmup': warmup,
+                    'threads': threads,
+                    # mAP is measured once per (model, imgsz)
+                    'dataset_dir': dataset_dir if index == 0 else None,
+                    'split': split
+                })
+
+    rows = []
+    accuracy = {}
+    context = multiprocessing.get_context('spawn')
+    # One configuration at a time, one process each: no interference, clean peak RSS
+    with context.Pool(processes=1, maxtasksperchild=1) as pool:
+        for i, row in enumerate(pool.imap(_benchmark_config, configs), 1):
+            key = (row['model'], row['imgsz'])
+            if row.get('mAP50') is not None:
+                accuracy[key] = {k: row[k] for k in ('precision', 'recall', 'mAP50', 'mAP50-95')}
+            elif key in accuracy:
+                row.update(accuracy[key])
+            rows.append(row)
+
+            if 'error' in row:
+                print(f"  ❌ [{i}/{len(configs)}] {row['model']} imgsz={row['imgsz']} batch={row['batch_size']}: {row['error']}")
+                continue
+            map_text = f"{row['mAP50-95']:.3f}" if row.get('mAP50-95') is not None else '-'
+            print(f"  ✅ [{i}/{len(configs)}] {row['model']:<12} imgsz={row['imgsz']:<4} batch={row['batch_size']:<3} "
+                  f"{row['images_per_second']:>7.1f} img/s  batch p50 {row['batch_latency_p50_ms']:>8.1f} ms  "
+                  f"p95 {row['batch_latency_p95_ms']:>8.1f} ms  RSS {row['peak_rss_mb']} MB  mAP50-95 {map_text}")
+    return rows
+
+def write_report(rows, frontier, output_dir, settings):
+    """Write benchmark_report.json (all rows + frontier) and benchmark_report.csv"""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    report = {
+        'benchmark_date': datetime.now().isoformat(),
+        'settings': settings,
+        'results': rows,
+        'pareto_frontier': frontier
+    }
+    json_path = output_dir / 'benchmark_report.json'
+    with open(json_path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    csv_path = output_dir / 'benchmark_report.csv'
+    frontier_keys = {(row['model'], row['imgsz'], row['batch_size']) for row in frontier}
+    fields = ['model', 'imgsz', 'batch_size', 'threads', 'images', 'load_time', 'images_per_second',
+              'batch_latency_p50_ms', 'batch_latency_p95_ms', 'peak_rss_mb', 'precision', 'recall', 'mAP50', 'mAP50-95']
+    with open(csv_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fields + ['pareto'], extrasaction='ignore')
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(dict(row, pareto=(row['model'], row['imgsz'], row['batch_size']) in frontier_keys))
+
+    return json_path, csv_path
+
+def main():
+    parser = argparse.ArgumentParser(description="Speed/accuracy benchmark of YOLOv8 models on the local CPU")
+    parser.add_argument("--models", nargs='+', help="Weights to benchmark (default: all local yolov8*.pt)")
+    parser.add_argument("--imgsz", type=int, nargs='+', default=[320, 480, 640, 960], help="Input sizes")
+    parser.add_argument("--batch_sizes", type=int, nargs='+', default=[1, 4, 8], help="Batch sizes")
+    parser.add_argument("--dataset_dir", help="Labeled dataset (ModelTrainer layout) for mAP")
+    parser.add_argument("--split", default="test", help="Dataset split used for timing and mAP")
+    parser.add_argument("--images", help="Images to time on (default: the dataset split)")
+    parser.add_argument("--max_images", type=int, default=64, help="Images used for timing")
+    parser.add_argument("--runs", type=int, default=3, help="Timed passes over the images")
+    parser.add_argument("--warmup", type=int, default=2, help="Untimed warmup predictions")
+    parser.add_argument("--threads", type=int, help="torch CPU threads (default: torch's choice)")
+    parser.add_argument("--output", default="benchmark_results", help="Report directory")
+    args = parser.parse_args()
+
+    weights = args.models or find_weights()
+    if not weights:
+        print("❌ No yolov8*.pt weights found in models/ or the current directory")
+        return
+
+    images_dir = Path(args.images) if args.images else (
+        Path(args.dataset_dir) / 'images' / args.split if args.dataset_dir else None)
+    if images_dir is None or not images_dir.exists():
+        print("❌ Provide --images or a --dataset_dir with an images/<split> folder")
+        return
+    images = sorted(p for p in images_dir.rglob('*') if p.suffix.lower() in IMAGE_EXTENSIONS)[:args.max_images]
+    if not images:
+        print(f"❌ No images found in {images_dir}")
+        return
+
+    print(f"🏁 Benchmarking {len(weights)} models x {len(args.imgsz)} sizes x {len(args.batch_sizes)} batch sizes "
+          f"on {len(images)} images")
+    if not args.dataset_dir:
+        print("⚠️  No --dataset_dir: accuracy (and the Pareto frontier) will be missing")
+
+    rows = run_benchmark(weights, args.imgsz, args.batch_sizes, images, args.dataset_dir, args.split,
+                         args.runs, args.warmup, args.threads)
+    frontier = pareto_frontier(rows)
+
+    settings = {key: value for key, value in vars(args).items()}
+    settings['models'] = weights
+    json_path, csv_path = write_report(rows, frontier, args.output, settings)
+
+    if frontier:
+        print("\n🏆 PARETO FRONTIER (throughput vs mAP50-95)")
+        print("=" * 70)
+        for row in frontier:
+            print(f"  {row['model']:<12} imgsz={row['imgsz']:<4} batch={row['batch_size']:<3} "
+                  f"{row['images_per_second']:>7.1f} img/s  batch p95 {row['batch_latency_p95_ms']:>8.1f} ms  "
+                  f"mAP50-95 {row['mAP50-95']:.3f}")
+    print(f"\n💾 Report saved: {json_path}")
+    print(f"💾 CSV saved: {csv_path}")
+
+if __name__ == "__main__":
+    main()
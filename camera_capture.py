@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Threaded camera capture with latest-frame semantics
+A background thread keeps reading the camera so consumers always get the newest frame
+"""
+
+import threading
+import time
+
+import cv2
+
+class LatestFrameCapture:
+    """
+    Reads a camera on a background thread and keeps only the most recent frame.
+
+    When inference is slower than the camera, the frames it could not keep up with
+    are overwritten instead of queuing in the driver buffer, so results never lag
+    further and further behind reality. Each frame carries an increasing id and the
+    time it was captured, which consumers use to count dropped frames and measure
+    end-to-end latency.
+    """
+
+    def __init__(self, camera_index=0, width=None, height=None, fps=None):
+        """
+        Args:
+            camera_index (int): Camera index (0 for default camera)
+            width (int): Requested capture width, or None for the camera default
+            height (int): Requested capture height, or None for the camera default
+            fps (int): Requested capture frame rate, or None for the camera default
+        """
+        self.camera_index = camera_index
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.capture_fps = 0.0
+        self.frames_captured = 0
+        self.failed = False
+
+        self._cap = None
+        self._thread = None
+        self._running = False
+        self._condition = threading.Condition()
+        self._frame = None
+        self._frame_id = 0
+        self._frame_time = 0.0
+
+    def start(self):
+        """Open the camera and start the capture thread. Returns False if the camera cannot be opened."""
+        self._cap = cv2.VideoCapture(self.camera_index)
+        if not self._cap.isOpened():
+            self._cap.release()
+            self._cap = None
+            return False
+
+        if self.width:
+            self._cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        if self.height:
+            self._cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        if self.fps:
+            self._cap.set(cv2.CAP_PROP_FPS, self.fps)
+        # Keep the driver queue short; the thread below already holds the latest frame
+        self._cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+        self._running = True
+        self._thread = threading.Thread(target=self._capture_loop, name=f"camera-{self.camera_index}", daemon=True)
+        self._thread.start()
+        return True
+
+    def _capture_loop(self):
+        last_time = None
+        while self._running:
+            ret, frame = self._cap.read()
+            now = time.time()
+            if not ret:
+                self.failed = True
+                break
+
+            if last_time is not None and now > last_time:
+                # Exponential moving average keeps the readout stable
+                instant_fps = 1.0 / (now - last_time)
+                self.capture_fps = instant_fps if self.capture_fps == 0 else 0.9 * self.capture_fps + 0.1 * instant_fps
+            last_time = now
+
+            with self._condition:
+                self._frame = frame
+                self._frame_id += 1
+                self._frame_time = now
+                self.frames_captured += 1
+                self._condition.notify_all()
+
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+
+    def read(self, last_frame_id=None, timeout=1.0):
+        """
+        Return the newest frame, waiting for one newer than last_frame_id if given.
+
+        Returns:
+            tuple: (frame_id, frame, capture_time), or (None, None, None) if no new
+                   frame arrived within timeout or the camera stopped.
+        """
+        deadline = time.time() + timeout
+        with self._condition:
+            while self._frame is None or (last_frame_id is not None and self._frame_id <= last_frame_id):
+                remaining = deadline - time.time()
+                if not self._running or remaining <= 0:
+                    return None, None, None
+                self._condition.wait(remaining)
+            return self._frame_id, self._frame, self._frame_time
+
+    @property
+    def is_running(self):
+        return self._running
+
+    def stop(self):
+        """Stop the capture thread and release the camera"""
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Detection accuracy metrics against YOLO-format ground truth
+Vectorized IoU matching per image, accumulated into fixed-size confidence histograms
+so precision / recall / mAP can be computed over any number of images in flat memory
+"""
+
+from pathlib import Path
+
+import numpy as np
+
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+
+def box_iou(boxes1, boxes2):
+    """
+    Pairwise IoU of two sets of xyxy boxes.
+
+    Args:
+        boxes1 (numpy.ndarray): N x 4 boxes.
+        boxes2 (numpy.ndarray): M x 4 boxes.
+
+    Returns:
+        numpy.ndarray: N x M IoU matrix.
+    """
+    area1 = (boxes1[:, 2] - boxes1[:, 0]).clip(0) * (boxes1[:, 3] - boxes1[:, 1]).clip(0)
+    area2 = (boxes2[:, 2] - boxes2[:, 0]).clip(0) * (boxes2[:, 3] - boxes2[:, 1]).clip(0)
+    top_left = np.maximum(boxes1[:, None, :2], boxes2[None, :, :2])
+    bottom_right = np.minimum(boxes1[:, None, 2:], boxes2[None, :, 2:])
+    inter = (bottom_right - top_left).clip(0).prod(axis=2)
+    return inter / (area1[:, None] + area2[None, :] - inter + 1e-9)
+
+def match_detections(det_boxes, det_classes, gt_boxes, gt_classes, iou_thresholds=IOU_THRESHOLDS):
+    """
+    Mark each detection as a true positive at each IoU threshold.
+
+    Ground truth and detections are matched one-to-one, same class only, highest
+    IoU first, using one IoU matrix for all thresholds.
+
+    Returns:
+        numpy.ndarray: D x T boolean array (detections x thresholds).
+    """
+    correct = np.zeros((len(det_boxes), len(iou_thresholds)), dtype=bool)
+    if len(det_boxes) == 0 or len(gt_boxes) == 0:
+        return correct
+
+    iou = box_iou(gt_boxes, det_boxes)
+    iou = iou * (gt_classes[:, None] == det_classes[None, :])
+    for t, threshold in enumerate(iou_thresholds):
+        gt_idx, det_idx = np.nonzero(iou >= threshold)
+        if len(gt_idx) == 0:
+            continue
+        if len(gt_idx) > 1:
+            order = np.argsort(-iou[gt_idx, det_idx], kind='stable')
+            gt_idx, det_idx = gt_idx[order], det_idx[order]
+            # Keep the best pair for each detection, then for each ground truth box
+            _, first = np.unique(det_idx, return_index=True)
+            gt_idx, det_idx = gt_idx[first], det_idx[first]
+            _, first = np.unique(gt_idx, return_index=True)
+            det_idx = det_idx[first]
+        correct[det_idx, t] = True
+    return correct
+
+def load_yolo_labels(label_path, width, height):
+    """
+    Read a YOLO label file (class cx cy w h, normalized) as pixel xyxy boxes.
+
+    Returns:
+        tuple: (class ids int array, N x 4 float array); empty if the file is missing.
+    """
+    label_path = Path(label_path)
+    if not label_path.exists():
+        return np.zeros(0, dtype=np.int64), np.zeros((0, 4), dtype=np.float64)
+
+    rows = np.loadtxt(label_path, ndmin=2)
+    if rows.size == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros((0, 4), dtype=np.float64)
+
+    classes = rows[:, 0].astype(np.int64)
+    cx, cy, w, h = rows[:, 1] * width, rows[:, 2] * height, rows[:, 3] * width, rows[:, 4] * height
+    boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+    return classes, boxes
+
+def label_path_for(image_path, images_root, labels_root):
+    """dataset/images/<split>/x.jpg -> dataset/labels/<split>/x.txt"""
+    relative = Path(image_path).relative_to(images_root)
+    return Path(labels_root) / relative.with_suffix('.txt')
+
+class DetectionMetrics:
+    """
+    Streaming precision / recall / mAP accumulator.
+
+    Per-image matches are folded into per-class histograms over confidence bins
+    (true positives per IoU threshold and detection counts), so memory does not grow
+    with the number of images or detections. Precision and recall are exact up to
+    the bin resolution.
+    """
+
+    def __init__(self, num_classes, iou_thresholds=IOU_THRESHOLDS, conf_bins=1000):
+        """
+        Args:
+            num_classes (int): Number of classes (len(model.names)).
+            iou_thresholds (numpy.ndarray): IoU thresholds for mAP (0.5:0.95 by default).
+            conf_bins (int): Confidence histogram resolution.
+        """
+        self.num_classes = num_classes
+        self.iou_thresholds = np.asarray(iou_thresholds)
+        self.conf_bins = conf_bins
+        self.true_positives = np.zeros((num_classes, conf_bins, len(self.iou_thresholds)), dtype=np.int64)
+        self.detections = np.zeros((num_classes, conf_bins), dtype=np.int64)
+        self.ground_truth = np.zeros(num_classes, dtype=np.int64)
+        self.images = 0
+
+    def update(self, data, gt_classes, gt_boxes):
+        """
+        Add one image.
+
+        Args:
+            data (numpy.ndarray): N x 6 detections (x1, y1, x2, y2, confidence, class_id) in pixels.
+            gt_classes (numpy.ndarray): Ground truth class ids.
+            gt_boxes (numpy.ndarray): Ground truth xyxy boxes in pixels.
+
+        Raises:
+            ValueError: If a class id is outside 0..num_classes-1 (labels for a different model).
+        """
+        det_classes = data[:, 5].astype(np.int64) if len(data) else np.zeros(0, dtype=np.int64)
+        for kind, classes in (('label', gt_classes), ('detection', det_classes)):
+            invalid = classes[(classes < 0) | (classes >= self.num_classes)]
+            if len(invalid):
+                raise ValueError(f"{kind} class id {int(invalid[0])} outside the model's {self.num_classes} classes")
+
+        self.images += 1
+        self.ground_truth += np.bincount(gt_classes, minlength=self.num_classes)
+        if len(data) == 0:
+            return
+
+        correct = match_detections(data[:, :4], det_classes, gt_boxes, gt_classes, self.iou_thresholds)
+        bins = np.minimum((data[:, 4] * self.conf_bins).astype(np.int64), self.conf_bins - 1)
+        np.add.at(self.detections, (det_classes, bins), 1)
+        np.add.at(self.true_positives, (det_classes, bins), correct.astype(np.int64))
+
+    def _curves(self):
+        """Cumulative precision / recall from the highest confidence bin down: C x B x T each"""
+        tp = self.true_positives[:, ::-1].cumsum(axis=1)
+        detections = self.detections[:, ::-1].cumsum(axis=1)[..., None]
+        recall = tp / np.maximum(self.ground_truth, 1)[:, None, None]
+        precision = np.where(detections > 0, tp / np.maximum(detections, 1), 0.0)
+        return precision, recall
+
+    @staticmethod
+    def _average_precision(precision, recall):
+        """COCO-style 101-point interpolated AP of one precision / recall curve"""
+        envelope = np.maximum.accumulate(precision[::-1])[::-1]
+        points = np.linspace(0, 1, 101)
+        idx = np.searchsorted(recall, points, side='left')
+        values = np.where(idx < len(envelope), envelope[np.minimum(idx, len(envelope) - 1)], 0.0)
+        return values.mean()
+
+    def compute(self, conf_threshold=0.25, names=None):
+        """
+        Summarize the accumulated images.
+
+        Args:
+            conf_threshold (float): Confidence at which precision and recall are reported.
+            names (dict): Class id -> name for the per-class table.
+
+        Returns:
+            dict: precision, recall (IoU 0.5 at conf_threshold), mAP50, mAP50-95 and per-class AP.
+        """
+        precision, recall = self._curves()
+        present = np.nonzero(self.ground_truth > 0)[0]
+
+        ap = np.zeros((self.num_classes, len(self.iou_thresholds)))
+        for c in present:
+            for t in range(len(self.iou_thresholds)):
+                ap[c, t] = self._average_precision(precision[c, :, t], recall[c, :, t])
+
+        # Detections at or above conf_threshold, all classes (absent classes only add false positives)
+        first_bin = min(int(conf_threshold * self.conf_bins), self.conf_bins - 1)
+        tp = self.true_positives[:, first_bin:, 0].sum()
+        detections = self.detections[:, first_bin:].sum()
+        ground_truth = self.ground_truth.sum()
+
+        per_class = {}
+        for c in present:
+            name = names[c] if names is not None and c in names else str(c)
+            per_class[name] = {
+                'ground_truth': int(self.ground_truth[c]),
+                'AP50': float(ap[c, 0]),
+                'AP50-95': float(ap[c].mean())
+            }
+
+        return {
+            'images': self.images,
+            'ground_truth': int(ground_truth),
+            'precision': float(tp / detections) if detections else 0.0,
+            'recall': float(tp / ground_truth) if ground_truth else 0.0,
+            'mAP50': float(ap[present, 0].mean()) if len(present) else 0.0,
+            'mAP50-95': float(ap[present].mean()) if len(present) else 0.0,
+            'conf_threshold': conf_threshold,
+            'per_class': per_class
+        }
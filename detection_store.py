@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Consolidated detection output
+Streams detections from many images into one compact file instead of one JSON report per image
+
+Formats:
+    jsonl   - one compact JSON line per image with flat column arrays
+    npy     - a directory of columnar .npy files (image_id, class_id, conf, x1, y1, x2, y2)
+              that load with a single memory-mapped read
+    parquet - one row per detection (requires pyarrow)
+"""
+
+import json
+import shutil
+import struct
+import threading
+from pathlib import Path
+
+import numpy as np
+
+DETECTION_FORMATS = ("jsonl", "npy", "parquet")
+
+# Column name -> dtype for the columnar formats
+DETECTION_COLUMNS = {
+    "image_id": np.int64,
+    "class_id": np.int32,
+    "conf": np.float32,
+    "x1": np.float32,
+    "y1": np.float32,
+    "x2": np.float32,
+    "y2": np.float32,
+}
+
+class DetectionWriter:
+    """
+    Base class for buffered, thread-safe detection writers.
+
+    Rows are buffered in memory and flushed every flush_rows detections, so files grow
+    incrementally and a crash only loses the current buffer. image_id is supplied by
+    the caller so that parts written by separate workers can simply be concatenated.
+    """
+
+    suffix = ""
+
+    def __init__(self, path, flush_rows=50000):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.flush_rows = flush_rows
+        self.images_written = 0
+        self.detections_written = 0
+        self._buffered_rows = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def add(self, image_id, source, boxes):
+        """
+        Add the detections for one image.
+
+        Args:
+            image_id (int): Stable id of the image within this run.
+            source (str): Path or name of the source image.
+            boxes (numpy.ndarray): N x 6 array of x1, y1, x2, y2, conf, class_id
+                                   (the layout of ultralytics ``boxes.data``).
+        """
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 6)
+        with self._lock:
+            self._add(int(image_id), str(source), boxes)
+            self.images_written += 1
+            self.detections_written += len(boxes)
+            self._buffered_rows += max(1, len(boxes))
+            if self._buffered_rows >= self.flush_rows:
+                self._flush()
+                self._buffered_rows = 0
+
+    def close(self):
+        with self._lock:
+            if not self._closed:
+                self._flush()
+                self._close()
+                self._closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _add(self, image_id, source, boxes):
+        raise NotImplementedError
+
+    def _flush(self):
+        raise NotImplementedError
+
+    def _close(self):
+        pass
+
+    @classmethod
+    def concatenate(cls, part_paths, dest_path):
+        """Merge part outputs (in order) into one output at dest_path and remove the parts"""
+        raise NotImplementedError
+
+class JsonlDetectionWriter(DetectionWriter):
+    """One compact JSON line per image: image_id, source and flat column arrays"""
+
+    suffix = ".jsonl"
+
+    def __init__(self, path, flush_rows=50000):
+        super().__init__(path, flush_rows)
+        self._file = open(self.path, 'w', buffering=1024 * 1024)
+        self._lines = []
+
+    def _add(self, image_id, source, boxes):
+        # Round in float64 so the JSON holds short decimals rather than float32 artefacts
+        boxes = boxes.astype(np.float64)
+        record = {
+            "image_id": image_id,
+            "source": source,
+            "class_id": boxes[:, 5].astype(np.int32).tolist(),
+            "conf": np.round(boxes[:, 4], 4).tolist(),
+            "x1": np.round(boxes[:, 0], 1).tolist(),
+            "y1": np.round(boxes[:, 1], 1).tolist(),
+            "x2": np.round(boxes[:, 2], 1).tolist(),
+            "y2": np.round(boxes[:, 3], 1).tolist(),
+        }
+        self._lines.append(json.dumps(record, separators=(',', ':')))
+
+    def _flush(self):
+        if self._lines:
+            self._file.write("\n".join(self._lines) + "\n")
+            self._lines = []
+        self._file.flush()
+
+    def _close(self):
+        self._file.close()
+
+    @classmethod
+    def concatenate(cls, part_paths, dest_path):
+        with open(dest_path, 'wb') as dest:
+            for part in part_paths:
+                with open(part, 'rb') as src:
+                    shutil.copyfileobj(src, dest, 1024 * 1024)
+                Path(part).unlink()
+
+def _npy_header(dtype, length, header_size=128):
+    """Fixed-size .npy v1.0 header so the row count can be patched in place on close"""
+    header = "{'descr': %r, 'fortran_order': False, 'shape': (%d,), }" % (np.dtype(dtype).str, length)
+    # magic (6) + version (2) + header length (2) + header + newline
+    padding = header_size - 10 - len(header) - 1
+    return b"\x93NUMPY\x01\x00" + struct.pack("<H", header_size - 10) + (header + " " * padding + "\n").encode("latin1")
+
+class NpyDetectionWriter(DetectionWriter):
+    """
+    Columnar output: a directory with one .npy file per column plus images.jsonl.
+
+    Each column is appended to as the buffer flushes and its header is rewritten with
+    the final length on close, so ``load_detections`` can np.load every column with
+    mmap_mode='r' without reading the data up front.
+    """
+
+    suffix = ""
+
+    def __init__(self, path, flush_rows=50000):
+        super().__init__(path, flush_rows)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._columns = {name: [] for name in DETECTION_COLUMNS}
+        self._lengths = {name: 0 for name in DETECTION_COLUMNS}
+        self._files = {}
+        for name, dtype in DETECTION_COLUMNS.items():
+            f = open(self.path / f"{name}.npy", 'wb')
+            f.write(_npy_header(dtype, 0))
+            self._files[name] = f
+        self._images_file = open(self.path / "images.jsonl", 'w', buffering=1024 * 1024)
+
+    def _add(self, image_id, source, boxes):
+        columns = self._columns
+        columns["image_id"].append(np.full(len(boxes), image_id, dtype=np.int64))
+        columns["class_id"].append(boxes[:, 5].astype(np.int32))
+        columns["conf"].append(boxes[:, 4])
+        columns["x1"].append(boxes[:, 0])
+        columns["y1"].append(boxes[:, 1])
+        columns["x2"].append(boxes[:, 2])
+        columns["y2"].append(boxes[:, 3])
+        self._images_file.write(json.dumps({"image_id": image_id, "source": source, "detections": len(boxes)}) + "\n")
+
+    def _flush(self):
+        for name, dtype in DETECTION_COLUMNS.items():
+            chunks = self._columns[name]
+            if chunks:
+                data = np.concatenate(chunks).astype(dtype, copy=False)
+                data.tofile(self._files[name])
+                self._lengths[name] += len(data)
+                self._columns[name] = []
+            self._files[name].flush()
+        self._images_file.flush()
+
+    def _close(self):
+        for name, dtype in DETECTION_COLUMNS.items():
+            f = self._files[name]
+            f.seek(0)
+            f.write(_npy_header(dtype, self._lengths[name]))
+            f.close()
+        self._images_file.close()
+
+    @classmethod
+    def concatenate(cls, part_paths, dest_path):
+        dest_path = Path(dest_path)
+        dest_path.mkdir(parents=True, exist_ok=True)
+        parts = [load_detections(part) for part in part_paths]
+        for name, dtype in DETECTION_COLUMNS.items():
+            total = sum(len(part[name]) for part in parts)
+            merged = np.lib.format.open_memmap(dest_path / f"{name}.npy", mode='w+', dtype=dtype, shape=(total,))
+            offset = 0
+            for part in parts:
+                merged[offset:offset + len(part[name])] = part[name]
+                offset += len(part[name])
+            merged.flush()
+            del merged
+        with open(dest_path / "images.jsonl", 'wb') as dest:
+            for part in part_paths:
+                with open(Path(part) / "images.jsonl", 'rb') as src:
+                    shutil.copyfileobj(src, dest, 1024 * 1024)
+        del parts
+        for part in part_paths:
+            shutil.rmtree(part)
+
+class ParquetDetectionWriter(DetectionWriter):
+    """One row per detection, written as a new row group on every flush (requires pyarrow)"""
+
+    suffix = ".parquet"
+
+    def __init__(self, path, flush_rows=50000):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet output requires pyarrow: pip install pyarrow")
+        super().__init__(path, flush_rows)
+        self._pa = pa
+        self._schema = pa.schema([("source", pa.string())] + [
+            (name, pa.from_numpy_dtype(dtype)) for name, dtype in DETECTION_COLUMNS.items()
+        ])
+        self._writer = pq.ParquetWriter(str(self.path), self._schema)
+        self._sources = []
+        self._boxes = []
+        self._image_ids = []
+
+    def _add(self, image_id, source, boxes):
+        self._sources.extend([source] * len(boxes))
+        self._image_ids.append(np.full(len(boxes), image_id, dtype=np.int64))
+        self._boxes.append(boxes)
+
+    def _flush(self):
+        if not self._boxes:
+            return
+        boxes = np.concatenate(self._boxes)
+        columns = {
+            "source": self._sources,
+            "image_id": np.concatenate(self._image_ids),
+            "class_id": boxes[:, 5].astype(np.int32),
+            "conf": boxes[:, 4],
+            "x1": boxes[:, 0],
+            "y1": boxes[:, 1],
+            "x2": boxes[:, 2],
+            "y2": boxes[:, 3],
+        }
+        self._writer.write_table(self._pa.table(columns, schema=self._schema))
+        self._sources, self._boxes, self._image_ids = [], [], []
+
+    def _close(self):
+        self._writer.close()
+
+    @classmethod
+    def concatenate(cls, part_paths, dest_path):
+        import pyarrow.parquet as pq
+        writer = None
+        for part in part_paths:
+            part_file = pq.ParquetFile(str(part))
+            if writer is None:
+                writer = pq.ParquetWriter(str(dest_path), part_file.schema_arrow)
+            for group in range(part_file.num_row_groups):
+                writer.write_table(part_file.read_row_group(group))
+        if writer is not None:
+            writer.close()
+        for part in part_paths:
+            Path(part).unlink()
+
+DETECTION_WRITERS = {
+    "jsonl": JsonlDetectionWriter,
+    "npy": NpyDetectionWriter,
+    "parquet": ParquetDetectionWriter,
+}
+
+def detection_output_path(output_dir, run_name, output_format, part=None):
+    """Path of the consolidated output for a run (or of one worker's part of it)"""
+    name = run_name if part is None else f"{run_name}.part{part}"
+    return Path(output_dir) / f"{name}{DETECTION_WRITERS[output_format].suffix}"
+
+def open_detection_writer(output_format, path, flush_rows=50000):
+    """Create the writer for output_format ('jsonl', 'npy' or 'parquet') at path"""
+    if output_format not in DETECTION_WRITERS:
+        raise ValueError(f"Unknown detection output format: {output_format}")
+    return DETECTION_WRITERS[output_format](path, flush_rows=flush_rows)
+
+def load_detections(path, mmap=True):
+    """
+    Load a columnar (.npy directory) detection output as a dict of column arrays.
+
+    With mmap=True the columns are memory-mapped, so a full day of detections is
+    available without reading it into memory.
+    """
+    path = Path(path)
+    mmap_mode = 'r' if mmap else None
+    return {name: np.load(path / f"{name}.npy", mmap_mode=mmap_mode) for name in DETECTION_COLUMNS}
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Shared helpers for converting YOLO results into plain Python / NumPy data
+
+Every script used to walk result.boxes one box at a time, pulling single tensor
+elements out with int()/float()/tolist(). These helpers copy boxes.data to the
+CPU once, split it into columns with NumPy, and build the existing dict schemas
+from whole-column tolist() calls.
+"""
+
+import numpy as np
+
+EMPTY_DETECTIONS = np.zeros((0, 6), dtype=np.float32)
+
+def result_to_array(result):
+    """
+    Convert a result's boxes into one N x 6 float32 array in a single device-to-host copy.
+
+    Columns are x1, y1, x2, y2, confidence, class_id (the ultralytics boxes.data layout,
+    without the track id column that tracking results carry).
+    """
+    boxes = result.boxes if result is not None else None
+    if boxes is None or len(boxes) == 0:
+        return EMPTY_DETECTIONS
+    data = boxes.data
+    if hasattr(data, "cpu"):
+        data = data.cpu().numpy()
+    data = np.asarray(data, dtype=np.float32)
+    if data.shape[1] > 6:
+        data = data[:, [0, 1, 2, 3, -2, -1]]
+    return data
+
+def split_columns(data):
+    """Split an N x 6 detection array into (xyxy, confidences, class_ids) arrays"""
+    return data[:, :4], data[:, 4], data[:, 5].astype(np.int64)
+
+def to_report_detections(data, names, conf_digits=None, bbox_digits=None, bbox_format="dict"):
+    """
+    Build the report schema used by batch processing and the web API.
+
+    Args:
+        data (numpy.ndarray): N x 6 array from result_to_array.
+        names (dict): Class id -> class name mapping (model.names).
+        conf_digits (int): Round confidences to this many digits (None keeps full precision).
+        bbox_digits (int): Round box coordinates to this many digits (None keeps full precision).
+        bbox_format (str): "dict" for {"x1", "y1", "x2", "y2"}, "list" for [x1, y1, x2, y2],
+                           or None to leave the box out.
+
+    Returns:
+        list: [{"class": ..., "confidence": ..., "bbox": ...}, ...]
+    """
+    xyxy, confidences, class_ids = split_columns(data)
+    if conf_digits is not None:
+        confidences = np.round(confidences.astype(np.float64), conf_digits)
+    class_names = [names[class_id] for class_id in class_ids.tolist()]
+    confidences = confidences.tolist()
+
+    if bbox_format is None:
+        return [{"class": name, "confidence": conf} for name, conf in zip(class_names, confidences)]
+
+    if bbox_digits is not None:
+        xyxy = np.round(xyxy.astype(np.float64), bbox_digits)
+    boxes = xyxy.tolist()
+    if bbox_format == "dict":
+        boxes = [{"x1": x1, "y1": y1, "x2": x2, "y2": y2} for x1, y1, x2, y2 in boxes]
+    return [
+        {"class": name, "confidence": conf, "bbox": box}
+        for name, conf, box in zip(class_names, confidences, boxes)
+    ]
+
+def to_detector_detections(data, names):
+    """
+    Build the ObjectDetector schema: integer box_coordinates, class_id, class_name and confidence.
+    """
+    xyxy, confidences, class_ids = split_columns(data)
+    class_ids = class_ids.tolist()
+    return [
+        {
+            "box_coordinates": box,
+            "class_id": class_id,
+            "class_name": names[class_id],
+            "confidence": conf
+        }
+        for box, class_id, conf in zip(xyxy.astype(np.int64).tolist(), class_ids, confidences.tolist())
+    ]
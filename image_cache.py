@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Decode-once image cache for model comparisons
+Images are decoded and letterboxed to the model input size once, then shared by every
+model evaluated in the same run (optionally persisted as a memory-mapped .npy file)
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+def letterbox(image, imgsz=640, color=114):
+    """
+    Resize an image to fit imgsz x imgsz keeping its aspect ratio, padding the rest.
+
+    Matches the ultralytics letterbox (centered, gray padding), so the model sees the
+    same input as when it letterboxes the image itself.
+
+    Returns:
+        tuple: (imgsz x imgsz x 3 uint8 image, meta dict with original 'shape', 'scale' and 'pad')
+    """
+    height, width = image.shape[:2]
+    scale = min(imgsz / height, imgsz / width)
+    new_height, new_width = int(round(height * scale)), int(round(width * scale))
+    if (new_height, new_width) != (height, width):
+        image = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+
+    top = (imgsz - new_height) // 2
+    left = (imgsz - new_width) // 2
+    boxed = np.full((imgsz, imgsz, 3), color, dtype=np.uint8)
+    boxed[top:top + new_height, left:left + new_width] = image
+    return boxed, {'shape': [height, width], 'scale': scale, 'pad': [left, top]}
+
+def unletterbox(boxes, meta):
+    """Map N x 4 xyxy boxes from letterboxed coordinates back to the original image"""
+    left, top = meta['pad']
+    height, width = meta['shape']
+    boxes = (boxes - np.array([left, top, left, top], dtype=boxes.dtype)) / meta['scale']
+    boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, width)
+    boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, height)
+    return boxes
+
+def unletterbox_detections(data, meta):
+    """Copy of an N x 6 detection array (see detection_utils) with boxes in original image coordinates"""
+    data = data.copy()
+    if len(data):
+        data[:, :4] = unletterbox(data[:, :4], meta)
+    return data
+
+class ImageCache:
+    """
+    Letterboxed images keyed by content hash and input size, decoded at most once.
+
+    Comparisons scan the same image set in the same order once per model, which
+    defeats LRU eviction as soon as the set is larger than the cache (every access
+    misses). So in both modes the first images that fit in max_bytes are kept and
+    the rest are decoded on the fly without being cached: each pass gets hits for
+    the cached part instead of none.
+
+    In memory, images live in a dict. With cache_dir, they are stored in one
+    memory-mapped images_<imgsz>.npy file with a JSON index, so later runs (and
+    other processes) reuse them without decoding. The file grows with the images
+    actually stored (reserve() sizes it for a known set up front) rather than being
+    allocated at max_bytes. With max_bytes=0 and no cache_dir nothing is kept or
+    hashed: it just decodes and letterboxes each image as it is read.
+    """
+
+    INDEX_NAME = "image_cache_{imgsz}.json"
+    DATA_NAME = "images_{imgsz}.npy"
+
+    def __init__(self, imgsz=640, max_bytes=2 * 1024 ** 3, cache_dir=None):
+        """
+        Args:
+            imgsz (int): Model input size images are letterboxed to.
+            max_bytes (int): Size cap of the cached images.
+            cache_dir (str): Persist the cache here as a memory-mapped .npy file (None for memory only).
+        """
+        self.imgsz = imgsz
+        self.max_bytes = max_bytes
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.image_bytes = imgsz * imgsz * 3
+        self.hits = 0
+        self.misses = 0
+
+        # (path, size, mtime_ns) -> content hash, so unchanged files are not re-hashed
+        self._hashes = {}
+        self._memory = {}  # hash -> (image, meta)
+        self._memory_bytes = 0
+        self.capacity = max(0, self.max_bytes // self.image_bytes)  # Most images cached
+
+        self._rows = {}  # hash -> (row, meta) in the memory-mapped file
+        self._data = None
+        self._index_dirty = False
+        if self.cache_dir is not None:
+            self._open_mmap()
+
+    def _open_mmap(self):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._data_path = self.cache_dir / self.DATA_NAME.format(imgsz=self.imgsz)
+        index_path = self.cache_dir / self.INDEX_NAME.format(imgsz=self.imgsz)
+
+        # Otherwise the file is created by the first store (or reserve())
+        if self._data_path.exists() and index_path.exists():
+            self._data = np.load(str(self._data_path), mmap_mode='r+')
+            with open(index_path, 'r') as f:
+                index = json.load(f)
+            self._rows = {key: (entry['row'], entry['meta']) for key, entry in index['images'].items()}
+
+    def reserve(self, count):
+        """Size the memory-mapped file for count images up front (capped by max_bytes; no-op in memory)"""
+        if self.cache_dir is not None:
+            self._grow(min(count, self.capacity))
+
+    def _grow(self, rows):
+        """Resize the memory-mapped file to hold rows images, keeping the stored ones. Returns False on failure."""
+        current = len(self._data) if self._data is not None else 0
+        if rows <= current:
+            return True
+
+        used = len(self._rows)
+        tmp_path = self._data_path.with_name(self._data_path.stem + ".tmp.npy")
+        grown = np.lib.format.open_memmap(str(tmp_path), mode='w+', dtype=np.uint8,
+                                          shape=(rows, self.imgsz, self.imgsz, 3))
+        if used:
+            grown[:used] = self._data[:used]
+        grown.flush()
+        del grown
+
+        self._data = None
+        try:
+            os.replace(tmp_path, self._data_path)
+        except OSError:
+            # e.g. Windows, while a caller still holds a view of the old file
+            tmp_path.unlink()
+            if current:
+                self._data = np.load(str(self._data_path), mmap_mode='r+')
+            return False
+        self._data = np.load(str(self._data_path), mmap_mode='r+')
+        self._index_dirty = True
+        return True
+
+    def _fingerprint_hash(self, image_path):
+        stat = os.stat(image_path)
+        fingerprint = (str(image_path), stat.st_size, stat.st_mtime_ns)
+        content_hash = self._hashes.get(fingerprint)
+        data = None
+        if content_hash is None:
+            with open(image_path, 'rb') as f:
+                data = f.read()
+            content_hash = hashlib.sha1(data).hexdigest()
+            self._hashes[fingerprint] = content_hash
+        return content_hash, data
+
+    def get(self, image_path):
+        """
+        Return the letterboxed image and its letterbox meta, decoding the file only on a miss.
+
+        Returns:
+            tuple: (image, meta), or (None, None) if the file cannot be decoded.
+        """
+        if self.capacity == 0 and self.cache_dir is None:
+            # Streaming: nothing will be stored, so skip hashing
+            self.misses += 1
+            image = cv2.imread(str(image_path), cv2.IMREAD_COLOR)
+            return letterbox(image, self.imgsz) if image is not None else (None, None)
+
+        content_hash, data = self._fingerprint_hash(image_path)
+
+        if self._data is not None and content_hash in self._rows:
+            row, meta = self._rows[content_hash]
+            self.hits += 1
+            return self._data[row], meta
+        if content_hash in self._memory:
+            self.hits += 1
+            return self._memory[content_hash]
+
+        self.misses += 1
+        if data is None:
+            with open(image_path, 'rb') as f:
+                data = f.read()
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            return None, None
+        image, meta = letterbox(image, self.imgsz)
+        self._store(content_hash, image, meta)
+        return image, meta
+
+    def _store(self, content_hash, image, meta):
+        # Once full, nothing is evicted: later images are simply not cached
+        if self.cache_dir is not None:
+            row = len(self._rows)
+            if row >= self.capacity:
+                return
+            if row >= (len(self._data) if self._data is not None else 0):
+                # Double the file as it fills, so it tracks the set size rather than max_bytes
+                if not self._grow(min(self.capacity, max(16, 2 * row))):
+                    return
+            self._data[row] = image
+            self._rows[content_hash] = (row, meta)
+            self._index_dirty = True
+            return
+
+        if self._memory_bytes + self.image_bytes > self.max_bytes:
+            return
+        self._memory[content_hash] = (image, meta)
+        self._memory_bytes += self.image_bytes
+
+    def load_batch(self, image_paths):
+        """
+        Return (images, metas, paths) for the decodable images among image_paths.
+        """
+        images, metas, paths = [], [], []
+        for image_path in image_paths:
+            image, meta = self.get(image_path)
+            if image is None:
+                print(f"    ⚠️  Could not read image: {image_path}")
+                continue
+            images.append(image)
+            metas.append(meta)
+            paths.append(image_path)
+        return images, metas, paths
+
+    def flush(self):
+        """Write the memory-mapped data and its index to disk"""
+        if self._data is None or not self._index_dirty:
+            return
+        self._data.flush()
+        index_path = self.cache_dir / self.INDEX_NAME.format(imgsz=self.imgsz)
+        with open(index_path, 'w') as f:
+            json.dump({
+                'imgsz': self.imgsz,
+                'images': {key: {'row': row, 'meta': meta} for key, (row, meta) in self._rows.items()}
+            }, f)
+        self._index_dirty = False
+
+    def stats(self):
+        return {
+            'imgsz': self.imgsz,
+            'hits': self.hits,
+            'misses': self.misses,
+            'cached_images': len(self._rows) if self.cache_dir is not None else len(self._memory)
+        }
+
+    def close(self):
+        self.flush()
+        self._data = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
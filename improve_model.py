@@ -9,7 +9,10 @@ to show recognition improvements
 
 import os
 import cv2
+import numpy as np
 from ultralytics import YOLO
+from detection_utils import result_to_array, to_report_detections
+from image_cache import ImageCache, unletterbox_detections
 from pathlib import Path
 import time
 import json
@@ -26,6 +29,8 @@ class ModelComparison:
         }
         
         self.available_models = []
+        # model path -> (loaded model, seconds it took to load); each model is loaded once per run
+        self.loaded_models = {}
         self.check_available_models()
     
     def check_available_models(self):
@@ -59,30 +64,43 @@ class ModelComparison:
             print(f"❌ Failed to download {model_name}: {e}")
             return None
     
+    def get_model(self, model_path):
+        """
+        Return a loaded model, loading it only the first time it is requested.
+        
+        Returns:
+            tuple: (model, load_time) where load_time is 0.0 if the model was already loaded.
+        """
+        if model_path in self.loaded_models:
+            return self.loaded_models[model_path][0], 0.0
+        
+        start_time = time.time()
+        model = YOLO(model_path)
+        load_time = time.time() - start_time
+        self.loaded_models[model_path] = (model, load_time)
+        return model, load_time
+    
+    def warmup_model(self, model, runs=2, imgsz=640):
+        """Run a few untimed predictions so one-off setup costs stay out of the latency figures"""
+        start_time = time.time()
+        dummy = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+        for _ in range(runs):
+            model(dummy, verbose=False)
+        return time.time() - start_time
+    
     def test_model_on_image(self, model_path, image_path, conf_threshold=0.25):
         """Test a single model on an image"""
         try:
             print(f"  🧪 Testing {os.path.basename(model_path)}...")
             
-            start_time = time.time()
-            model = YOLO(model_path)
-            load_time = time.time() - start_time
+            model, load_time = self.get_model(model_path)
             
             start_time = time.time()
             results = model(image_path, conf=conf_threshold, verbose=False)
             inference_time = time.time() - start_time
             
             # Extract detection info
-            detections = []
-            if results[0].boxes is not None:
-                boxes = results[0].boxes
-                for i in range(len(boxes)):
-                    detection = {
-                        'class': model.names[int(boxes.cls[i])],
-                        'confidence': float(boxes.conf[i]),
-                        'bbox': boxes.xyxy[i].tolist()
-                    }
-                    detections.append(detection)
+            detections = to_report_detections(result_to_array(results[0]), model.names, bbox_format="list")
             
             return {
                 'model': os.path.basename(model_path),
@@ -176,7 +194,125 @@ class ModelComparison:
         """Test all available models on an image"""
         return self.compare_models_on_image(image_path, None, conf_threshold)
     
-    def batch_test_images(self, images_dir, output_file="model_comparison_results.json"):
+    def benchmark_models(self, image_paths, models_to_test=None, conf_threshold=0.25, batch_size=8, warmup_runs=2,
+                         imgsz=640, image_cache=None):
+        """
+        Compare models over a set of images the way they would run in production.
+        
+        Each model is loaded once and warmed up, then the whole image set is run
+        through it in batches. Load, warmup and steady-state latency are reported
+        separately, so the per-image numbers are not skewed by weight loading.
+        Images are decoded and letterboxed once (ImageCache) and shared by all models;
+        decoding happens outside the timed window, so latency and images/sec measure
+        predict calls only and every model is timed the same way.
+        
+        Args:
+            image_paths (list): Images to run every model on.
+            models_to_test (list): Model paths (all available models if None).
+            conf_threshold (float): Confidence threshold.
+            batch_size (int): Images per predict call.
+            warmup_runs (int): Untimed predictions before timing starts.
+            imgsz (int): Model input size.
+            image_cache (ImageCache): Shared decoded images (an in-memory one for imgsz if None).
+        
+        Returns:
+            tuple: (summary per model, {image path: [per-model results]})
+        """
+        if models_to_test is None:
+            models_to_test = list(self.available_models)
+            
+            # If no models available, download some basic ones
+            if not models_to_test:
+                for model in ['yolov8n.pt', 'yolov8s.pt']:
+                    downloaded = self.download_model(model)
+                    if downloaded:
+                        models_to_test.append(downloaded)
+        image_paths = [str(p) for p in image_paths]
+        batch_size = max(1, batch_size)
+        if image_cache is None:
+            image_cache = ImageCache(imgsz)
+        image_cache.reserve(len(image_paths))
+        
+        summary = {}
+        per_image = {image_path: [] for image_path in image_paths}
+        
+        for model_path in models_to_test:
+            model_name = os.path.basename(model_path)
+            print(f"\n🧪 Benchmarking {model_name} on {len(image_paths)} images...")
+            try:
+                model, load_time = self.get_model(model_path)
+                warmup_time = self.warmup_model(model, warmup_runs, image_cache.imgsz) if warmup_runs else 0.0
+            except Exception as e:
+                print(f"    ❌ Error loading {model_path}: {e}")
+                continue
+            
+            latencies = []
+            total_detections = 0
+            inference_time = 0.0
+            
+            for i in range(0, len(image_paths), batch_size):
+                # Decoding (or a cache hit) is not timed, whichever model runs first
+                images, metas, batch = image_cache.load_batch(image_paths[i:i + batch_size])
+                if not images:
+                    continue
+                start_time = time.time()
+                try:
+                    results = model(images, conf=conf_threshold, imgsz=image_cache.imgsz, verbose=False)
+                except Exception as e:
+                    print(f"    ❌ Error on batch starting at {batch[0]}: {e}")
+                    continue
+                batch_time = time.time() - start_time
+                inference_time += batch_time
+                per_image_time = batch_time / len(batch)
+                
+                for image_path, meta, result in zip(batch, metas, results):
+                    data = unletterbox_detections(result_to_array(result), meta)
+                    detections = to_report_detections(data, model.names, bbox_format="list")
+                    total_detections += len(detections)
+                    latencies.append(per_image_time)
+                    per_image[image_path].append({
+                        'model': model_name,
+                        'detections': detections,
+                        'detection_count': len(detections),
+                        'inference_time': per_image_time
+                    })
+            
+            latency_ms = np.array(latencies) * 1000
+            summary[model_name] = {
+                'load_time': load_time,
+                'warmup_time': warmup_time,
+                'images': len(latencies),
+                'batch_size': batch_size,
+                'total_detections': total_detections,
+                'images_per_second': len(latencies) / inference_time if inference_time > 0 else 0.0,
+                'latency_ms': {
+                    'mean': float(latency_ms.mean()) if len(latency_ms) else 0.0,
+                    'p50': float(np.percentile(latency_ms, 50)) if len(latency_ms) else 0.0,
+                    'p95': float(np.percentile(latency_ms, 95)) if len(latency_ms) else 0.0,
+                    'p99': float(np.percentile(latency_ms, 99)) if len(latency_ms) else 0.0
+                }
+            }
+        
+        return summary, per_image
+    
+    def display_benchmark_summary(self, summary):
+        """Display load, warmup and steady-state latency per model"""
+        if not summary:
+            print("❌ No results to display")
+            return
+        
+        print("\n📊 MODEL BENCHMARK (steady state)")
+        print("=" * 88)
+        print(f"{'Model':<15} {'Load (s)':<10} {'Warmup (s)':<12} {'p50 (ms)':<10} {'p95 (ms)':<10} {'p99 (ms)':<10} {'Img/s':<8} {'Objects':<8}")
+        print("-" * 88)
+        for model_name, stats in summary.items():
+            latency = stats['latency_ms']
+            print(f"{model_name.replace('.pt', '').upper():<15} {stats['load_time']:<10.2f} {stats['warmup_time']:<12.2f} "
+                  f"{latency['p50']:<10.1f} {latency['p95']:<10.1f} {latency['p99']:<10.1f} "
+                  f"{stats['images_per_second']:<8.1f} {stats['total_detections']:<8}")
+    
+    def batch_test_images(self, images_dir, output_file="model_comparison_results.json",
+                          conf_threshold=0.25, batch_size=8, warmup_runs=2, imgsz=640, cache_dir=None):
         """Test all images in a directory with all available models"""
         images_dir = Path(images_dir)
         if not images_dir.exists():
@@ -185,17 +321,17 @@ class ModelComparison:
         
         print(f"📁 Batch testing images in: {images_dir}")
         
-        all_results = {}
         image_files = list(images_dir.glob("*.jpg")) + list(images_dir.glob("*.png"))
-        
-        for img_path in image_files:
-            print(f"\n📸 Processing: {img_path.name}")
-            results = self.test_all_available_models(str(img_path))
-            all_results[str(img_path)] = results
+        with ImageCache(imgsz, cache_dir=cache_dir) as image_cache:
+            summary, all_results = self.benchmark_models(image_files, conf_threshold=conf_threshold,
+                                                         batch_size=batch_size, warmup_runs=warmup_runs,
+                                                         image_cache=image_cache)
+            print(f"🗂️  Image cache: {image_cache.stats()}")
+        self.display_benchmark_summary(summary)
         
         # Save results to JSON
         with open(output_file, 'w') as f:
-            json.dump(all_results, f, indent=2, default=str)
+            json.dump({'models': summary, 'images': all_results}, f, indent=2, default=str)
         
         print(f"\n💾 Results saved to: {output_file}")
         return all_results
@@ -247,13 +383,19 @@ def main():
     parser.add_argument("--batch_dir", help="Directory of images to batch test")
     parser.add_argument("--conf", type=float, default=0.25, help="Confidence threshold")
     parser.add_argument("--demo", action="store_true", help="Run improvement demonstration")
+    parser.add_argument("--batch_size", type=int, default=8, help="Images per predict call in batch testing")
+    parser.add_argument("--warmup", type=int, default=2, help="Warmup predictions per model before timing")
+    parser.add_argument("--imgsz", type=int, default=640, help="Model input size for batch testing")
+    parser.add_argument("--cache_dir", help="Persist decoded test images here (memory-mapped) for reuse across runs")
     
     args = parser.parse_args()
     
     comparator = ModelComparison()
     
     if args.batch_dir:
-        comparator.batch_test_images(args.batch_dir)
+        comparator.batch_test_images(args.batch_dir, conf_threshold=args.conf,
+                                     batch_size=args.batch_size, warmup_runs=args.warmup,
+                                     imgsz=args.imgsz, cache_dir=args.cache_dir)
     elif args.demo:
         comparator.demonstrate_improvement(args.image)
     else:
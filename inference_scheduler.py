@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Micro-batching inference scheduler
+Coalesces concurrent single-image requests into batched predict calls
+"""
+
+import threading
+import time
+from concurrent.futures import Future
+
+class MicroBatchScheduler:
+    """
+    Collects single-image predict requests and runs them as one batched call per model.
+
+    Requests for the same model and predict settings that arrive within max_wait
+    seconds of each other (or until max_batch images are waiting) are passed to the
+    model together, and each caller's future is resolved with its own result.
+    Submitted requests run on one dispatcher thread, so they do not fight each other
+    over CPU threads, and none waits more than max_wait before its batch starts.
+    Callers that bypass the scheduler (live streams, file-based fallbacks for videos
+    and undecodable uploads) still call the model concurrently with it.
+    """
+
+    def __init__(self, max_batch=8, max_wait=0.008, name="inference-scheduler"):
+        """
+        Args:
+            max_batch (int): Largest number of images passed to one predict call.
+            max_wait (float): Seconds the oldest request may wait for others to join its batch.
+            name (str): Name of the dispatcher thread.
+        """
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait
+        self.batches = 0
+        self.images = 0
+
+        self._pending = {}  # (model id, settings) -> [model, kwargs, [(image, future, enqueued)]]
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, model, image, **predict_kwargs):
+        """
+        Queue one image for inference.
+
+        Args:
+            model: Loaded YOLO model.
+            image (numpy.ndarray): BGR image.
+            **predict_kwargs: Predict settings (conf, iou, imgsz, device, ...); only
+                              requests with identical settings share a batch.
+
+        Returns:
+            Future: Resolves to the ultralytics Results object for image.
+        """
+        future = Future()
+        key = (id(model), tuple(sorted(predict_kwargs.items())))
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Inference scheduler is closed")
+            entry = self._pending.get(key)
+            if entry is None:
+                entry = self._pending[key] = [model, predict_kwargs, []]
+            entry[2].append((image, future, time.time()))
+            self._condition.notify_all()
+        return future
+
+    def predict(self, model, image, timeout=None, **predict_kwargs):
+        """Blocking form of submit(): return the Results object for image"""
+        return self.submit(model, image, **predict_kwargs).result(timeout)
+
+    def _next_batch(self):
+        """Wait for a batch that is full or whose oldest request has waited max_wait"""
+        with self._condition:
+            while True:
+                if not self._pending:
+                    if self._closed:
+                        return None
+                    self._condition.wait()
+                    continue
+
+                now = time.time()
+                ready_key = None
+                next_deadline = None
+                for key, (_, _, requests) in self._pending.items():
+                    deadline = requests[0][2] + self.max_wait
+                    if len(requests) >= self.max_batch or deadline <= now or self._closed:
+                        ready_key = key
+                        break
+                    if next_deadline is None or deadline < next_deadline:
+                        next_deadline = deadline
+
+                if ready_key is None:
+                    self._condition.wait(next_deadline - now)
+                    continue
+
+                model, kwargs, requests = self._pending[ready_key]
+                batch, rest = requests[:self.max_batch], requests[self.max_batch:]
+                if rest:
+                    self._pending[ready_key][2] = rest
+                else:
+                    del self._pending[ready_key]
+                return model, kwargs, batch
+
+    def _run(self):
+        while True:
+            job = self._next_batch()
+            if job is None:
+                return
+            model, kwargs, batch = job
+            # Skip requests whose callers cancelled while waiting
+            batch = [(image, future) for image, future, _ in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            images = [image for image, _ in batch]
+            futures = [future for _, future in batch]
+
+            try:
+                results = model(images, **kwargs)
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.images += len(images)
+            for future, result in zip(futures, results):
+                future.set_result(result)
+
+    @property
+    def backlog(self):
+        with self._condition:
+            return sum(len(entry[2]) for entry in self._pending.values())
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'images': self.images,
+            'average_batch': round(self.images / self.batches, 2) if self.batches else 0.0,
+            'backlog': self.backlog,
+            'max_batch': self.max_batch,
+            'max_wait_ms': round(self.max_wait * 1000, 1)
+        }
+
+    def close(self, timeout=10):
+        """Run the requests already queued, then stop the dispatcher"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join(timeout)
@@ -0,0 +1,479 @@
+#!/usr/bin/env python3
+"""
+Shared live camera streams for the web interface
+One capture + inference worker per stream, fanned out to any number of viewers
+"""
+
+import json
+import math
+import threading
+import time
+
+import cv2
+
+from camera_capture import LatestFrameCapture
+
+class EncodedFrame:
+    """
+    A published frame plus its JPEG bytes, encoded at most once.
+
+    The first viewer (or endpoint) that needs the bytes encodes them; everyone
+    else, including re-sends of the same frame, reuses the cached result.
+    on_encode(seconds) is called once, when the encoding actually happens.
+    """
+
+    def __init__(self, image, detections=None, jpeg_quality=70, annotated=False, on_encode=None):
+        self.image = image
+        self.detections = detections
+        self.jpeg_quality = jpeg_quality
+        self.annotated = annotated
+        self.timestamp = time.time()
+        self.encode_time = None
+        self.on_encode = on_encode
+        self._jpeg = None
+        self._lock = threading.Lock()
+
+    def jpeg_bytes(self):
+        """Return the JPEG encoding of the frame, encoding it on first use"""
+        if self._jpeg is None:
+            with self._lock:
+                if self._jpeg is None:
+                    start = time.time()
+                    _, buffer = cv2.imencode('.jpg', self.image, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+                    self._jpeg = buffer.tobytes()
+                    self.encode_time = time.time() - start
+                    if self.on_encode is not None:
+                        self.on_encode(self.encode_time)
+        return self._jpeg
+
+    @property
+    def is_encoded(self):
+        return self._jpeg is not None
+
+class AdaptiveRateController:
+    """
+    Picks the inference stride, output pacing and quality level from measured latency.
+
+    Inference and encode times are tracked as moving averages. The stride is the
+    number of camera frames one inference takes at the target frame rate, output is
+    paced to the target frame rate, and when inference + encode stays over the
+    latency budget the controller steps down to a smaller inference size and lower
+    JPEG quality (and back up once there is sustained headroom).
+
+    Encode times are reported from viewer threads, so the averages and level state
+    are guarded by a lock.
+    """
+
+    def __init__(self, target_fps=30, latency_budget=0.2, imgsz_levels=(640, 480, 320),
+                 jpeg_levels=(70, 55, 40), max_skip=10, overload_frames=15, recover_frames=90, smoothing=0.2):
+        """
+        Args:
+            target_fps (float): Output frame rate to aim for.
+            latency_budget (float): Seconds allowed for inference + encode of one frame.
+            imgsz_levels (tuple): Inference sizes from best to cheapest.
+            jpeg_levels (tuple): JPEG qualities from best to cheapest (same length as imgsz_levels).
+            max_skip (int): Upper bound on frames between inferences.
+            overload_frames (int): Consecutive over-budget inferences before downgrading.
+            recover_frames (int): Consecutive inferences under half the budget before upgrading.
+            smoothing (float): Weight of the newest sample in the moving averages.
+        """
+        self.target_fps = target_fps
+        self.latency_budget = latency_budget
+        self.imgsz_levels = imgsz_levels
+        self.jpeg_levels = jpeg_levels
+        self.max_skip = max_skip
+        self.overload_frames = overload_frames
+        self.recover_frames = recover_frames
+        self.smoothing = smoothing
+
+        self.level = 0
+        self.inference_time = 0.0
+        self.encode_time = 0.0
+        self._over_budget = 0
+        self._under_budget = 0
+        self._lock = threading.Lock()
+
+    def _average(self, current, sample):
+        return sample if current == 0 else (1 - self.smoothing) * current + self.smoothing * sample
+
+    def record_inference(self, seconds):
+        with self._lock:
+            self.inference_time = self._average(self.inference_time, seconds)
+            self._update_level()
+
+    def record_encode(self, seconds):
+        with self._lock:
+            self.encode_time = self._average(self.encode_time, seconds)
+
+    def _update_level(self):
+        """Step the level from the current averages (caller holds the lock)"""
+        latency = self.inference_time + self.encode_time
+        if latency > self.latency_budget:
+            self._over_budget += 1
+            self._under_budget = 0
+        elif latency < self.latency_budget / 2:
+            self._under_budget += 1
+            self._over_budget = 0
+        else:
+            self._over_budget = self._under_budget = 0
+
+        if self._over_budget >= self.overload_frames and self.level < len(self.imgsz_levels) - 1:
+            self.level += 1
+            self._over_budget = 0
+            # Old averages describe the previous level
+            self.inference_time = self.encode_time = 0.0
+        elif self._under_budget >= self.recover_frames and self.level > 0:
+            self.level -= 1
+            self._under_budget = 0
+            self.inference_time = self.encode_time = 0.0
+
+    @property
+    def skip(self):
+        """Camera frames per inference: how many frames one inference occupies at the target rate"""
+        with self._lock:
+            latency = self.inference_time + self.encode_time
+        frames = int(math.ceil(latency * self.target_fps))
+        return min(self.max_skip, max(1, frames))
+
+    @property
+    def imgsz(self):
+        return self.imgsz_levels[self.level]
+
+    @property
+    def jpeg_quality(self):
+        return self.jpeg_levels[self.level]
+
+    def pacing_delay(self, loop_start):
+        """Seconds to sleep so the loop started at loop_start publishes at the target frame rate"""
+        return max(0.0, 1.0 / self.target_fps - (time.time() - loop_start))
+
+    def stats(self):
+        return {
+            'level': self.level,
+            'imgsz': self.imgsz,
+            'jpeg_quality': self.jpeg_quality,
+            'skip': self.skip,
+            'inference_ms': round(self.inference_time * 1000, 1),
+            'encode_ms': round(self.encode_time * 1000, 1)
+        }
+
+class LiveStreamWorker:
+    """
+    Captures one camera, runs inference on it and publishes the latest frame.
+
+    Every viewer of the same (camera, model, confidence) stream reads from the same
+    worker, and frames are published as EncodedFrame objects, so each frame is
+    JPEG-encoded once no matter how many viewers and endpoints use it. How often
+    inference runs, how fast frames go out and at what size and quality are decided
+    by an AdaptiveRateController from the measured latencies.
+    """
+
+    def __init__(self, key, camera_index, process_frame, frame_size=(640, 480), fps=30,
+                 controller=None, reuse_annotated=False, on_result=None):
+        """
+        Args:
+            key (tuple): Hub key identifying this stream.
+            camera_index (int): Camera index to capture from.
+            process_frame (callable): (frame, imgsz) -> (annotated frame, detections); runs inference
+                                      on a BGR frame.
+            frame_size (tuple): Requested capture (width, height).
+            fps (int): Requested capture frame rate.
+            controller (AdaptiveRateController): Rate controller (a default one targeting fps if None).
+            reuse_annotated (bool): On skipped frames, re-send the last annotated frame (already
+                                    encoded) instead of encoding the raw camera frame.
+            on_result (callable): Called with each annotated EncodedFrame.
+        """
+        self.key = key
+        self.process_frame = process_frame
+        self.controller = controller or AdaptiveRateController(target_fps=fps)
+        self.reuse_annotated = reuse_annotated
+        self.on_result = on_result
+        self.last_annotated = None
+        self.capture = LatestFrameCapture(camera_index, width=frame_size[0], height=frame_size[1], fps=fps)
+        self.subscribers = 0
+        self.frames_published = 0
+
+        self._condition = threading.Condition()
+        self._frame = None
+        self._version = 0
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        """Open the camera and start the worker thread. Returns False if the camera cannot be opened."""
+        if not self.capture.start():
+            return False
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=f"live-stream-{self.key}", daemon=True)
+        self._thread.start()
+        return True
+
+    def _run(self):
+        controller = self.controller
+        frame_id = None
+        frames_since_inference = None
+        try:
+            while self._running:
+                frame_id, frame, _ = self.capture.read(frame_id, timeout=1.0)
+                if frame is None:
+                    if not self.capture.is_running:
+                        break
+                    continue
+                loop_start = time.time()
+
+                packet = None
+                if frames_since_inference is None or frames_since_inference + 1 >= controller.skip:
+                    frames_since_inference = 0
+                    try:
+                        inference_start = time.time()
+                        annotated_frame, detections = self.process_frame(frame, controller.imgsz)
+                        controller.record_inference(time.time() - inference_start)
+                        # Encoding happens lazily in the viewers; each encode reports its time once
+                        packet = EncodedFrame(annotated_frame, detections, controller.jpeg_quality, annotated=True,
+                                              on_encode=controller.record_encode)
+                        self.last_annotated = packet
+                        if self.on_result is not None:
+                            self.on_result(packet)
+                    except Exception as e:
+                        print(f"❌ Live stream inference failed: {e}")
+                else:
+                    frames_since_inference += 1
+                    if self.reuse_annotated and self.last_annotated is not None:
+                        packet = self.last_annotated
+
+                if packet is None:
+                    packet = EncodedFrame(frame, jpeg_quality=controller.jpeg_quality,
+                                          on_encode=controller.record_encode)
+
+                self.publish(packet)
+                delay = controller.pacing_delay(loop_start)
+                if delay > 0:
+                    time.sleep(delay)
+        finally:
+            self.capture.stop()
+            with self._condition:
+                self._running = False
+                self._condition.notify_all()
+
+    def publish(self, packet):
+        """Make packet (an EncodedFrame) the latest frame and wake every waiting viewer"""
+        with self._condition:
+            self._frame = packet
+            self._version += 1
+            self.frames_published += 1
+            self._condition.notify_all()
+
+    def wait_frame(self, last_version=None, timeout=1.0):
+        """
+        Return (version, EncodedFrame) for the newest frame after last_version.
+
+        Returns (last_version, None) on timeout or once the worker has stopped.
+        """
+        with self._condition:
+            self._condition.wait_for(
+                lambda: not self._running or (self._frame is not None and self._version != last_version),
+                timeout
+            )
+            if self._frame is None or self._version == last_version:
+                return last_version, None
+            return self._version, self._frame
+
+    @property
+    def is_running(self):
+        return self._running
+
+    @property
+    def is_stopped(self):
+        """True once the worker thread has exited and released the camera"""
+        return self._thread is None or not self._thread.is_alive()
+
+    def stop(self, timeout=2):
+        """Stop the worker and wait up to timeout seconds (None: until it has released the camera)"""
+        self._running = False
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+class LiveStreamHub:
+    """
+    Reference-counted registry of live stream workers.
+
+    acquire() starts a worker for a key on first use and hands the same worker to
+    later viewers; release() stops it when the last viewer disconnects.
+
+    Workers are built (model load, camera open) outside the hub lock, under a
+    per-key start lock, so concurrent first viewers of a key share one start and
+    other streams are not blocked. A worker for a key only starts once the
+    previous worker for that key has fully stopped and released the camera.
+    """
+
+    def __init__(self):
+        self._workers = {}
+        self._retired = {}  # key -> worker being stopped by release() or stop_all()
+        self._start_locks = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key, factory):
+        """
+        Get the running worker for key, creating it with factory() if needed.
+
+        Returns:
+            LiveStreamWorker: The shared worker, or None if it could not be started.
+        """
+        with self._lock:
+            worker = self._workers.get(key)
+            if worker is not None and worker.is_running:
+                worker.subscribers += 1
+                return worker
+            start_lock = self._start_locks.setdefault(key, threading.Lock())
+
+        with start_lock:
+            # Another viewer may have started it while we waited
+            with self._lock:
+                worker = self._workers.get(key)
+                if worker is not None and worker.is_running:
+                    worker.subscribers += 1
+                    return worker
+                previous = self._retired.get(key) or self._workers.pop(key, None)
+
+            if previous is not None:
+                previous.stop(timeout=None)
+
+            worker = factory()
+            started = worker is not None and worker.start()
+            with self._lock:
+                if self._retired.get(key) is previous:
+                    self._retired.pop(key, None)
+                self._start_locks.pop(key, None)
+                if not started:
+                    return None
+                self._workers[key] = worker
+                worker.subscribers += 1
+            return worker
+
+    def release(self, worker):
+        """Drop one viewer; stop the worker when nobody is watching any more"""
+        with self._lock:
+            worker.subscribers -= 1
+            if worker.subscribers > 0:
+                return
+            if self._workers.get(worker.key) is worker:
+                del self._workers[worker.key]
+                self._retired[worker.key] = worker
+        worker.stop()
+        with self._lock:
+            if self._retired.get(worker.key) is worker and worker.is_stopped:
+                del self._retired[worker.key]
+
+    def stop_all(self):
+        with self._lock:
+            workers = list(self._workers.values())
+            self._workers.clear()
+            for worker in workers:
+                self._retired[worker.key] = worker
+        for worker in workers:
+            worker.stop()
+        with self._lock:
+            for worker in workers:
+                if self._retired.get(worker.key) is worker and worker.is_stopped:
+                    del self._retired[worker.key]
+
+    def stats(self):
+        with self._lock:
+            return [
+                {
+                    'camera_index': worker.key[0],
+                    'model': worker.key[1],
+                    'confidence': worker.key[2],
+                    'viewers': worker.subscribers,
+                    'frames_published': worker.frames_published,
+                    'capture_fps': round(worker.capture.capture_fps, 1),
+                    'rate_control': worker.controller.stats()
+                }
+                for worker in self._workers.values()
+            ]
+
+class LiveDetectionState:
+    """
+    Versioned, lock-protected state of live detection shared by the web routes.
+
+    Holds whether live detection is active plus the latest published frame and
+    detections. Every change bumps the version and wakes waiters, so push channels
+    (server-sent events) block in wait_for_update() instead of clients polling, and
+    the JSON event for a version is serialized once no matter how many clients
+    receive it.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._active = False
+        self._frame = None
+        self._detections = None
+        self._version = 0
+        self._event = None
+
+    def _changed(self):
+        self._version += 1
+        self._event = None
+        self._condition.notify_all()
+
+    def set_active(self, active):
+        with self._condition:
+            self._active = active
+            if not active:
+                self._frame = None
+                self._detections = None
+            self._changed()
+
+    @property
+    def active(self):
+        return self._active
+
+    def publish(self, packet):
+        """Store an annotated EncodedFrame and its detections as the latest result"""
+        with self._condition:
+            self._frame = packet
+            self._detections = packet.detections
+            self._changed()
+
+    def snapshot(self):
+        """
+        Return a consistent view of the state.
+
+        Returns:
+            dict: version, active, frame (EncodedFrame or None) and detections (list).
+        """
+        with self._condition:
+            return self._snapshot()
+
+    def _snapshot(self):
+        return {
+            'version': self._version,
+            'active': self._active,
+            'frame': self._frame,
+            'detections': self._detections or []
+        }
+
+    def wait_for_update(self, last_version=None, timeout=15.0):
+        """Wait for a version newer than last_version; returns a snapshot, or None on timeout"""
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._version != last_version, timeout):
+                return None
+            return self._snapshot()
+
+    def event(self, snapshot):
+        """Server-sent event text for a snapshot, serialized once per version"""
+        with self._condition:
+            if snapshot['version'] == self._version and self._event is not None:
+                return self._event
+        payload = {
+            'version': snapshot['version'],
+            'active': snapshot['active'],
+            'detections': snapshot['detections'],
+            'objects_count': len(snapshot['detections']),
+            'timestamp': snapshot['frame'].timestamp if snapshot['frame'] is not None else None
+        }
+        event = f"id: {snapshot['version']}\ndata: {json.dumps(payload)}\n\n"
+        with self._condition:
+            if snapshot['version'] == self._version:
+                self._event = event
+        return event
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Load generator for the detection web API
+Posts an image to /upload from concurrent clients and reports requests/sec and latency
+percentiles, so the Flask (web_interface.py) and ASGI (web_asgi.py) servers can be compared
+"""
+
+import argparse
+import json
+import mimetypes
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+def build_multipart(fields, file_field, file_path):
+    """Encode form fields plus one file as multipart/form-data. Returns (body, content type)."""
+    boundary = uuid.uuid4().hex
+    lines = []
+    for name, value in fields.items():
+        lines.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+
+    file_path = Path(file_path)
+    content_type = mimetypes.guess_type(file_path.name)[0] or 'application/octet-stream'
+    lines.append((f'--{boundary}\r\nContent-Disposition: form-data; name="{file_field}"; '
+                  f'filename="{file_path.name}"\r\nContent-Type: {content_type}\r\n\r\n').encode())
+    lines.append(file_path.read_bytes())
+    lines.append(f'\r\n--{boundary}--\r\n'.encode())
+    return b''.join(lines), f'multipart/form-data; boundary={boundary}'
+
+def run_load_test(url, image_path, model='models/yolov8n.pt', confidence=0.25,
+                  concurrency=8, requests=200, duration=None, timeout=60):
+    """
+    Send requests from concurrency clients until `requests` have completed (or `duration` seconds pass).
+
+    Returns:
+        dict: Throughput, latency percentiles (ms) and error counts.
+    """
+    body, content_type = build_multipart({'model': model, 'confidence': confidence}, 'file', image_path)
+    latencies = []
+    errors = {}
+    lock = threading.Lock()
+    sent = [0]
+    start = time.time()
+
+    def next_request():
+        with lock:
+            if duration is not None and time.time() - start >= duration:
+                return False
+            if duration is None and sent[0] >= requests:
+                return False
+            sent[0] += 1
+            return True
+
+    def client():
+        while next_request():
+            request = urllib.request.Request(url, data=body, headers={'Content-Type': content_type})
+            request_start = time.time()
+            try:
+                with urllib.request.urlopen(request, timeout=timeout) as response:
+                    response.read()
+                    error = None if response.status == 200 else f"HTTP {response.status}"
+            except urllib.error.HTTPError as e:
+                error = f"HTTP {e.code}"
+            except Exception as e:
+                error = type(e).__name__
+            elapsed = time.time() - request_start
+
+            with lock:
+                if error is None:
+                    latencies.append(elapsed)
+                else:
+                    errors[error] = errors.get(error, 0) + 1
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(client)
+    total_time = time.time() - start
+
+    summary = {
+        'url': url,
+        'concurrency': concurrency,
+        'completed': len(latencies),
+        'errors': errors,
+        'total_time': round(total_time, 3),
+        'requests_per_second': round(len(latencies) / total_time, 2) if total_time > 0 else 0.0
+    }
+    if latencies:
+        ms = np.array(latencies) * 1000
+        summary['latency_ms'] = {
+            'mean': round(float(ms.mean()), 1),
+            'p50': round(float(np.percentile(ms, 50)), 1),
+            'p95': round(float(np.percentile(ms, 95)), 1),
+            'p99': round(float(np.percentile(ms, 99)), 1),
+            'max': round(float(ms.max()), 1)
+        }
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the detection web API")
+    parser.add_argument("image", help="Image to upload on every request")
+    parser.add_argument("--url", default="http://127.0.0.1:5000/upload",
+                        help="Endpoint to load (Flask default port 5000, ASGI 8000)")
+    parser.add_argument("--model", default="models/yolov8n.pt", help="Model requested by each upload")
+    parser.add_argument("--confidence", type=float, default=0.25, help="Confidence threshold")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent clients")
+    parser.add_argument("--requests", type=int, default=200, help="Total requests to send")
+    parser.add_argument("--duration", type=float, help="Run for this many seconds instead of a request count")
+    parser.add_argument("--warmup", type=int, default=5, help="Untimed requests sent first")
+    parser.add_argument("--output", help="Also write the summary to this JSON file")
+    args = parser.parse_args()
+
+    if not Path(args.image).exists():
+        print(f"❌ Image not found: {args.image}")
+        return
+
+    if args.warmup:
+        print(f"🔥 Warming up with {args.warmup} requests...")
+        run_load_test(args.url, args.image, args.model, args.confidence, concurrency=1, requests=args.warmup)
+
+    print(f"🚀 Load testing {args.url} with {args.concurrency} clients...")
+    summary = run_load_test(args.url, args.image, args.model, args.confidence,
+                            concurrency=args.concurrency, requests=args.requests, duration=args.duration)
+
+    print(f"✅ Completed: {summary['completed']} requests in {summary['total_time']}s")
+    print(f"⚡ Throughput: {summary['requests_per_second']} req/s")
+    if 'latency_ms' in summary:
+        latency = summary['latency_ms']
+        print(f"⏱️  Latency (ms): mean {latency['mean']}, p50 {latency['p50']}, "
+              f"p95 {latency['p95']}, p99 {latency['p99']}, max {latency['max']}")
+    if summary['errors']:
+        print(f"❌ Errors: {summary['errors']}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2)
+        print(f"💾 Summary saved: {args.output}")
+
+if __name__ == "__main__":
+    main()
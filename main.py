@@ -4,11 +4,17 @@ import os
 import cv2
 import torch
 from ultralytics import YOLO
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image
 import numpy as np
 import json
+import time
 import argparse
 from datetime import datetime
+from detection_store import DETECTION_FORMATS, detection_output_path, open_detection_writer
+from detection_utils import result_to_array, to_detector_detections
+from annotation import DetectionRenderer
+from camera_capture import LatestFrameCapture
+from background_writer import BackgroundWriter
 
 class ObjectDetector:
     """
@@ -51,6 +57,9 @@ class ObjectDetector:
             self.model.to(self.device)
             print("Default 'yolov8n.pt' model ensured (downloaded if needed).")
 
+        # Fonts, palette and label sizes are prepared once and reused for every frame
+        self.renderer = DetectionRenderer(num_classes=len(self.model.names))
+
     def detect_objects(self, image_path):
         """
         Runs object detection on a single image.
@@ -101,22 +110,8 @@ class ObjectDetector:
         Returns:
             dict: A dictionary containing image info and a list of detections.
         """
-        detections = []
-        names = result.names
-        boxes = result.boxes
-
-        for *xyxy, conf, cls in boxes.data:
-            x1, y1, x2, y2 = map(int, xyxy)
-            class_id = int(cls)
-            class_name = names[class_id]
-            confidence = float(conf)
-
-            detections.append({
-                "box_coordinates": [x1, y1, x2, y2],
-                "class_id": class_id,
-                "class_name": class_name,
-                "confidence": confidence
-            })
+        # One device-to-host copy and column-wise conversion instead of a per-box loop
+        detections = to_detector_detections(result_to_array(result), result.names)
         return {
             "image_path": original_image_path, # Use the path passed to the method
             "image_width": result.orig_shape[1],
@@ -127,51 +122,13 @@ class ObjectDetector:
     def draw_boxes(self, pil_image, detections_data):
         """
         Draws bounding boxes, labels, and confidence scores on a PIL Image.
-        (No changes needed here from previous version, as it operates on PIL objects directly)
-        """
-        draw = ImageDraw.Draw(pil_image)
-        try:
-            # Using a more robust font loading for Linux compatibility
-            # This path is common for many Linux distros.
-            # You might need to install 'fontconfig' on your host system if fonts are missing.
-            font_path = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
-            if not os.path.exists(font_path):
-                # Fallback if specific font not found or path is different
-                font_path = "/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf"
-                if not os.path.exists(font_path):
-                    font = ImageFont.load_default()
-                    print("Warning: Common truetype fonts not found, using default font.")
-                else:
-                    font = ImageFont.truetype(font_path, size=20)
-            else:
-                font = ImageFont.truetype(font_path, size=20)
-        except Exception:
-            font = ImageFont.load_default()
-            print("Warning: Error loading truetype font, using default font.")
-
-
-        colors = [(255, 0, 0), (0, 255, 0), (0, 0, 255), (255, 255, 0), (0, 255, 255), (255, 0, 255)]
-
-        for det in detections_data['detections']:
-            x1, y1, x2, y2 = det['box_coordinates']
-            class_name = det['class_name']
-            confidence = det['confidence']
-            class_id = det['class_id']
 
-            color = colors[class_id % len(colors)]
-
-            draw.rectangle([x1, y1, x2, y2], outline=color, width=3)
-
-            label = f"{class_name} ({confidence:.2f})"
-            
-            text_bbox = draw.textbbox((0,0), label, font=font)
-            text_width = text_bbox[2] - text_bbox[0]
-            text_height = text_bbox[3] - text_bbox[1]
-            
-            draw.rectangle([x1, y1 - text_height - 5, x1 + text_width + 5, y1], fill=color)
-            draw.text((x1 + 2, y1 - text_height - 3), label, fill=(255, 255, 255), font=font)
-
-        return pil_image
+        Kept for callers that work with PIL images; frame loops should call
+        self.renderer.draw on the BGR buffer directly to avoid the conversions.
+        """
+        img_np = np.array(pil_image)
+        self.renderer.draw(img_np, detections_data, rgb=True)
+        return Image.fromarray(img_np)
 
     def save_image(self, image, output_path):
         """
@@ -261,40 +218,96 @@ class ObjectDetector:
         else:
             return None, img_pil, {"image_path": "camera_frame", "detections": []}
 
-    def live_camera_detection(self, camera_index=0, save_detections=False, output_dir="output"):
+    def _save_live_frame(self, img_pil, detections_data, output_path, json_path=None):
+        """
+        Writer-thread job: annotate and save a live frame, plus its JSON report if json_path is given.
+        """
+        if detections_data['detections']:
+            self.save_image(self.draw_boxes(img_pil, detections_data), output_path)
+        else:
+            self.save_image(img_pil, output_path)
+
+        if json_path:
+            with open(json_path, 'w') as f:
+                json.dump(detections_data, f, indent=4)
+            print(f"Detection report saved to {json_path}")
+
+    def _record_frame(self, img_pil, detections_data, frame_path, detections_file):
+        """
+        Writer-thread job for record mode: save one annotated frame and append its detections
+        as a JSON line, encoding with OpenCV to keep up with the camera rate.
+        """
+        img_np = np.array(img_pil)
+        self.renderer.draw(img_np, detections_data, rgb=True)
+        cv2.imwrite(frame_path, cv2.cvtColor(img_np, cv2.COLOR_RGB2BGR))
+        detections_file.write(json.dumps(dict(detections_data, image_path=frame_path)) + "\n")
+
+    def live_camera_detection(self, camera_index=0, save_detections=False, output_dir="output", record=False,
+                              max_save_backlog=64):
         """
         Runs live object detection on camera feed.
+
+        Frames are captured on a background thread that keeps only the newest one,
+        so when inference is slower than the camera, stale frames are dropped
+        instead of buffering up and the display stays close to real time.
+        Saves are handed to background writers, so they never stall the live feed.
+        Recorded frames may be dropped under backlog; 's' / 'c' snapshots never are.
         
         Args:
             camera_index (int): Camera index (0 for default camera)
             save_detections (bool): Whether to save detected frames
             output_dir (str): Directory to save detected frames
+            record (bool): Continuously save every frame that has detections
+            max_save_backlog (int): Pending recorded frames kept before the oldest are dropped
         """
-        cap = cv2.VideoCapture(camera_index)
+        capture = LatestFrameCapture(camera_index)
         
-        if not cap.isOpened():
+        if not capture.start():
             print(f"Error: Could not open camera {camera_index}")
             return
             
         print("Starting live camera detection...")
         print("Press 'q' to quit, 's' to save current frame, 'c' to capture and save with timestamp")
         
+        writer = BackgroundWriter(max_backlog=max_save_backlog, name="live-record-writer")
+        snapshot_writer = BackgroundWriter(max_backlog=max_save_backlog, name="live-snapshot-writer",
+                                           drop_oldest=False)
+        recording_dir = None
+        recording_file = None
+        if record:
+            recording_dir = os.path.join(output_dir, f"recording_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+            os.makedirs(recording_dir, exist_ok=True)
+            recording_file = open(os.path.join(recording_dir, "detections.jsonl"), 'w')
+            print(f"Recording frames with detections to {recording_dir}")
+        
         frame_count = 0
+        dropped_frames = 0
+        last_frame_id = None
+        inference_fps = 0.0
+        latency_ms = 0.0
+        start_time = time.time()
         
         try:
             while True:
-                ret, frame = cap.read()
-                if not ret:
+                frame_id, frame, captured_at = capture.read(last_frame_id, timeout=2.0)
+                if frame is None:
                     print("Error: Could not read frame from camera")
                     break
+                if last_frame_id is not None:
+                    dropped_frames += frame_id - last_frame_id - 1
+                last_frame_id = frame_id
                 
                 # Run detection
+                inference_start = time.time()
                 result, img_pil, detections_data = self.detect_objects_from_frame(frame)
+                inference_time = time.time() - inference_start
+                if inference_time > 0:
+                    instant_fps = 1.0 / inference_time
+                    inference_fps = instant_fps if inference_fps == 0 else 0.9 * inference_fps + 0.1 * instant_fps
                 
-                # Draw bounding boxes on the frame
+                # Draw bounding boxes directly on the BGR frame
                 if detections_data['detections']:
-                    annotated_img = self.draw_boxes(img_pil.copy(), detections_data)
-                    display_frame = cv2.cvtColor(np.array(annotated_img), cv2.COLOR_RGB2BGR)
+                    display_frame = self.renderer.draw(frame, detections_data)
                     
                     # Add detection info to frame
                     info_text = f"Objects: {len(detections_data['detections'])}"
@@ -303,6 +316,13 @@ class ObjectDetector:
                     display_frame = frame
                     cv2.putText(display_frame, "No objects detected", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
                 
+                # Capture rate, inference rate and capture-to-display latency
+                frame_latency_ms = (time.time() - captured_at) * 1000
+                latency_ms = frame_latency_ms if latency_ms == 0 else 0.9 * latency_ms + 0.1 * frame_latency_ms
+                stats_text = (f"Capture {capture.capture_fps:.1f} FPS | Inference {inference_fps:.1f} FPS | "
+                              f"Latency {latency_ms:.0f} ms")
+                cv2.putText(display_frame, stats_text, (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 1)
+                
                 # Add instructions
                 cv2.putText(display_frame, "Press 'q' to quit, 's' to save, 'c' to capture", (10, display_frame.shape[0] - 20), 
                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
@@ -319,35 +339,47 @@ class ObjectDetector:
                     if save_detections:
                         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                         output_path = os.path.join(output_dir, f"live_detection_{timestamp}.jpg")
-                        annotated_img = self.draw_boxes(img_pil.copy(), detections_data)
-                        self.save_image(annotated_img, output_path)
-                        print(f"Frame saved to {output_path}")
+                        snapshot_writer.submit(self._save_live_frame, img_pil, detections_data, output_path)
                 elif key == ord('c'):
                     # Capture and save frame regardless of detections
                     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                     output_path = os.path.join(output_dir, f"camera_capture_{timestamp}.jpg")
-                    if detections_data['detections']:
-                        annotated_img = self.draw_boxes(img_pil.copy(), detections_data)
-                        self.save_image(annotated_img, output_path)
-                    else:
-                        self.save_image(img_pil, output_path)
-                    print(f"Frame captured and saved to {output_path}")
                     
                     # Also save JSON report if there are detections
+                    json_path = None
                     if detections_data['detections']:
                         json_path = os.path.join(output_dir, f"camera_capture_{timestamp}_report.json")
                         detections_data['timestamp'] = timestamp
-                        with open(json_path, 'w') as f:
-                            json.dump(detections_data, f, indent=4)
-                        print(f"Detection report saved to {json_path}")
+                    snapshot_writer.submit(self._save_live_frame, img_pil, detections_data, output_path, json_path)
+                
+                if recording_file is not None and detections_data['detections']:
+                    frame_path = os.path.join(recording_dir, f"frame_{frame_id:08d}.jpg")
+                    writer.submit(self._record_frame, img_pil, detections_data, frame_path, recording_file)
                 
                 frame_count += 1
                 
         except KeyboardInterrupt:
             print("\nInterrupted by user")
         finally:
-            cap.release()
+            capture.stop()
             cv2.destroyAllWindows()
+            snapshot_writer.close(wait=True, timeout=None)
+            if not writer.close(wait=True):
+                # Still behind after the timeout: drop the rest, let the running job finish
+                writer.close(wait=False)
+            # Only now can no record job still be writing to the file
+            if recording_file is not None:
+                recording_file.close()
+            if snapshot_writer.written or snapshot_writer.failed:
+                print(f"Saved {snapshot_writer.written} snapshots ({snapshot_writer.failed} failed)")
+            if writer.written or writer.dropped or writer.failed:
+                print(f"Recorded {writer.written} frames in the background "
+                      f"({writer.dropped} dropped under backlog, {writer.failed} failed)")
+            elapsed = time.time() - start_time
+            if elapsed > 0 and frame_count:
+                print(f"Processed {frame_count} frames in {elapsed:.1f}s ({frame_count / elapsed:.1f} FPS), "
+                      f"dropped {dropped_frames} stale frames, capture ran at {capture.capture_fps:.1f} FPS, "
+                      f"last latency {latency_ms:.0f} ms")
             print("Camera released and windows closed")
 
 
@@ -389,6 +421,9 @@ def main():
                         help="Display the annotated image(s) after processing.")
     parser.add_argument("--save_json", action="store_true",
                         help="Save a JSON report of detections.")
+    parser.add_argument("--detections_format", choices=DETECTION_FORMATS, default=None,
+                        help="With --save_json on a folder, stream all detections into one consolidated "
+                             "file (jsonl, npy or parquet) instead of one JSON report per image.")
     parser.add_argument("--count_objects", action="store_true",
                         help="Print object counts by category.")
     
@@ -399,6 +434,8 @@ def main():
                         help="Start live camera detection mode.")
     parser.add_argument("--camera_index", type=int, default=0,
                         help="Camera index to use (0 for default camera).")
+    parser.add_argument("--record", action="store_true",
+                        help="In live camera mode, continuously save every frame that has detections.")
 
     args = parser.parse_args()
 
@@ -415,7 +452,8 @@ def main():
         detector.live_camera_detection(
             camera_index=args.camera_index,
             save_detections=args.save_annotated,
-            output_dir=args.output_dir
+            output_dir=args.output_dir,
+            record=args.record
         )
         return
     
@@ -452,7 +490,7 @@ def main():
             
             # Process the captured image like a regular image
             if detections_data['detections']:
-                annotated_image = detector.draw_boxes(captured_image.copy(), detections_data)
+                annotated_image = detector.draw_boxes(captured_image, detections_data)
                 
                 if args.save_annotated:
                     output_image_path = os.path.join(args.output_dir, f"camera_capture_{timestamp}_detected.jpg")
@@ -492,9 +530,20 @@ def main():
             print(f"No image files found in {args.image_path}. Please ensure your input folder contains images.")
             return
 
-        for img_file in image_files:
-            process_single_image(detector, img_file, args)
-            print("-" * 50)
+        detection_writer = None
+        if args.save_json and args.detections_format:
+            run_name = f"detections_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            detections_path = detection_output_path(args.output_dir, run_name, args.detections_format)
+            detection_writer = open_detection_writer(args.detections_format, detections_path)
+
+        try:
+            for image_id, img_file in enumerate(image_files):
+                process_single_image(detector, img_file, args, detection_writer, image_id)
+                print("-" * 50)
+        finally:
+            if detection_writer is not None:
+                detection_writer.close()
+                print(f"Detections for {detection_writer.images_written} images saved to {detection_writer.path}")
 
     elif os.path.isfile(args.image_path):
         print(f"Processing single image: {args.image_path}")
@@ -503,15 +552,18 @@ def main():
         print(f"Invalid input path: {args.image_path}. Please provide a valid image file or directory, or use --camera or --live_camera for camera input.")
 
 
-def process_single_image(detector, current_image_path, args):
-    """Helper function to process a single image based on main arguments."""
+def process_single_image(detector, current_image_path, args, detection_writer=None, image_id=0):
+    """
+    Helper function to process a single image based on main arguments.
+    If a detection_writer is given, detections are streamed to it instead of a per-image JSON report.
+    """
     base_filename = os.path.basename(current_image_path)
     name_without_ext = os.path.splitext(base_filename)[0]
 
     result, original_pil_img, detections_data = detector.detect_objects(current_image_path)
 
     if original_pil_img:
-        annotated_image = detector.draw_boxes(original_pil_img.copy(), detections_data)
+        annotated_image = detector.draw_boxes(original_pil_img, detections_data)
 
         if args.save_annotated:
             # Construct output path relative to container's output_dir
@@ -522,7 +574,10 @@ def process_single_image(detector, current_image_path, args):
             detector.display_image(annotated_image)
 
         if args.save_json:
-            detector.generate_json_report(detections_data, args.output_dir, base_filename)
+            if detection_writer is not None:
+                detection_writer.add(image_id, current_image_path, result_to_array(result))
+            else:
+                detector.generate_json_report(detections_data, args.output_dir, base_filename)
 
         if args.count_objects:
             counts = detector.count_objects(detections_data)
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Thread-safe model registry
+Loads each model once, even under concurrent requests, and keeps resident models within a budget
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+def model_memory_mb(model):
+    """Estimate the memory held by a YOLO model's parameters and buffers, in MB"""
+    module = getattr(model, 'model', model)
+    try:
+        tensors = list(module.parameters()) + list(module.buffers())
+    except Exception:
+        return 0.0
+    return sum(t.numel() * t.element_size() for t in tensors) / (1024 * 1024)
+
+class ModelRegistry:
+    """
+    LRU cache of loaded models with single-flight loading.
+
+    Each key has its own load lock, so concurrent first requests for a model wait
+    for one load instead of each loading the weights, while requests for other
+    models are not blocked. When the resident models exceed max_models or
+    memory_budget_mb, the least recently used ones are evicted (requests already
+    holding a reference keep using it until they finish).
+    """
+
+    def __init__(self, loader, max_models=None, memory_budget_mb=None, size_fn=model_memory_mb):
+        """
+        Args:
+            loader (callable): key -> model; raises on failure.
+            max_models (int): Most models kept resident (None for no limit).
+            memory_budget_mb (float): Total estimated model memory allowed (None for no limit).
+            size_fn (callable): model -> estimated size in MB.
+        """
+        self.loader = loader
+        self.max_models = max_models
+        self.memory_budget_mb = memory_budget_mb
+        self.size_fn = size_fn
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_failures = 0
+
+        self._models = OrderedDict()  # key -> {'model', 'size_mb', 'load_time', 'loaded_at', 'uses'}
+        self._lock = threading.Lock()
+        self._load_locks = {}
+
+    def get(self, key):
+        """
+        Return the model for key, loading it on first use.
+
+        Raises:
+            Exception: Whatever the loader raised if the model could not be loaded.
+        """
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None:
+                self._models.move_to_end(key)
+                entry['uses'] += 1
+                self.hits += 1
+                return entry['model']
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        with load_lock:
+            # Another request may have finished loading while we waited
+            with self._lock:
+                entry = self._models.get(key)
+                if entry is not None:
+                    self._models.move_to_end(key)
+                    entry['uses'] += 1
+                    self.hits += 1
+                    return entry['model']
+                self.misses += 1
+
+            start = time.time()
+            try:
+                model = self.loader(key)
+            except Exception:
+                with self._lock:
+                    self.load_failures += 1
+                raise
+            load_time = time.time() - start
+
+            with self._lock:
+                self._models[key] = {
+                    'model': model,
+                    'size_mb': self.size_fn(model),
+                    'load_time': load_time,
+                    'loaded_at': time.time(),
+                    'uses': 1
+                }
+                self._evict(keep=key)
+                self._load_locks.pop(key, None)
+            return model
+
+    def _evict(self, keep):
+        """Drop least recently used models until within budget (never the one just loaded)"""
+        while len(self._models) > 1:
+            over_count = self.max_models is not None and len(self._models) > self.max_models
+            over_memory = self.memory_budget_mb is not None and self.memory_mb > self.memory_budget_mb
+            if not (over_count or over_memory):
+                break
+            oldest = next(iter(self._models))
+            if oldest == keep:
+                break
+            del self._models[oldest]
+            self.evictions += 1
+            print(f"♻️  Evicted model: {oldest}")
+
+    def evict(self, key):
+        """Remove a model from the registry. Returns True if it was resident."""
+        with self._lock:
+            return self._models.pop(key, None) is not None
+
+    @property
+    def memory_mb(self):
+        return sum(entry['size_mb'] for entry in self._models.values())
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._models
+
+    def __len__(self):
+        with self._lock:
+            return len(self._models)
+
+    def stats(self):
+        """Registry counters plus the resident models, least recently used first"""
+        with self._lock:
+            return {
+                'resident': [
+                    {
+                        'model': key,
+                        'size_mb': round(entry['size_mb'], 1),
+                        'load_time': round(entry['load_time'], 3),
+                        'loaded_at': entry['loaded_at'],
+                        'uses': entry['uses']
+                    }
+                    for key, entry in self._models.items()
+                ],
+                'memory_mb': round(self.memory_mb, 1),
+                'memory_budget_mb': self.memory_budget_mb,
+                'max_models': self.max_models,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'load_failures': self.load_failures
+            }
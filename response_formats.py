@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Response formats for the detection endpoints
+Lets API clients ask for compact detections, raw JPEG bytes or MessagePack instead of
+base64 images inside verbose JSON
+"""
+
+import base64
+import json
+import uuid
+
+import numpy as np
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+from detection_utils import result_to_array, split_columns, to_report_detections
+
+# json      - the original payload: base64 image + list of {"class", "confidence", "bbox"} dicts
+# compact   - flat arrays (class_ids, confidences, boxes as x1,y1,x2,y2,...), no image unless asked for
+# multipart - multipart/mixed: the compact JSON part followed by the annotated image as raw image/jpeg
+# msgpack   - the compact payload as MessagePack, image (if asked for) as raw bytes (requires msgpack)
+RESPONSE_FORMATS = ('json', 'compact', 'multipart', 'msgpack')
+
+ACCEPT_FORMATS = {
+    'application/json': 'json',
+    'application/x-msgpack': 'msgpack',
+    'application/msgpack': 'msgpack',
+    'multipart/mixed': 'multipart'
+}
+
+def negotiate_format(requested=None, accept=None):
+    """
+    Pick the response format from an explicit `format` parameter, else the Accept header.
+
+    msgpack is only offered when the msgpack package is installed; an Accept header
+    asking for it then falls through to the next acceptable format.
+
+    Raises:
+        ValueError: If an unknown or unavailable format is requested explicitly.
+    """
+    if requested:
+        requested = requested.lower()
+        if requested not in RESPONSE_FORMATS:
+            raise ValueError(f"Unsupported response format: {requested} (choose from {', '.join(RESPONSE_FORMATS)})")
+        if requested == 'msgpack' and msgpack is None:
+            raise ValueError("MessagePack responses require msgpack on the server: pip install msgpack")
+        return requested
+
+    for part in (accept or '').split(','):
+        fmt = ACCEPT_FORMATS.get(part.split(';')[0].strip().lower())
+        if fmt == 'msgpack' and msgpack is None:
+            continue
+        if fmt is not None:
+            return fmt
+    return 'json'
+
+def wants_image(fmt, value=None):
+    """Whether to render the annotated image: the `image` parameter if given, else the format's default"""
+    if value is None or value == '':
+        return fmt in ('json', 'multipart')
+    return value.lower() not in ('0', 'false', 'no', 'none')
+
+def compact_detections(data, names, conf_digits=3, bbox_digits=1):
+    """Detections as flat arrays, with class names only for the classes present"""
+    xyxy, confidences, class_ids = split_columns(data)
+    class_ids = class_ids.tolist()
+    return {
+        'class_ids': class_ids,
+        'class_names': {str(class_id): names[class_id] for class_id in sorted(set(class_ids))},
+        'confidences': np.round(confidences.astype(np.float64), conf_digits).tolist(),
+        'boxes': np.round(xyxy.astype(np.float64), bbox_digits).ravel().tolist()
+    }
+
+def encode_detection_response(fmt, result, names, meta, jpeg=None):
+    """
+    Encode a detection result in the requested format.
+
+    Args:
+        fmt (str): One of RESPONSE_FORMATS.
+        result: ultralytics Results for the image.
+        names (dict): Class id -> class name mapping.
+        meta (dict): Extra fields (model_used, confidence_threshold, ...).
+        jpeg (bytes): Encoded annotated image to include, or None for no image.
+
+    Returns:
+        tuple: (body bytes, content type)
+    """
+    data = result_to_array(result)
+
+    if fmt == 'json':
+        payload = {'success': True}
+        if jpeg is not None:
+            payload['image'] = base64.b64encode(jpeg).decode('utf-8')
+        detections = to_report_detections(data, names, conf_digits=3, bbox_digits=1)
+        payload['detections'] = detections
+        payload['objects_count'] = len(detections)
+        payload.update(meta)
+        return json.dumps(payload).encode('utf-8'), 'application/json'
+
+    payload = {'success': True}
+    payload.update(compact_detections(data, names))
+    payload['objects_count'] = len(data)
+    payload.update(meta)
+
+    if fmt == 'compact':
+        if jpeg is not None:
+            payload['image'] = base64.b64encode(jpeg).decode('utf-8')
+        return json.dumps(payload).encode('utf-8'), 'application/json'
+
+    if fmt == 'msgpack':
+        if msgpack is None:
+            raise ImportError("MessagePack responses require msgpack: pip install msgpack")
+        if jpeg is not None:
+            payload['image'] = jpeg
+        return msgpack.packb(payload, use_bin_type=True), 'application/x-msgpack'
+
+    if fmt == 'multipart':
+        boundary = uuid.uuid4().hex
+        parts = [
+            f'--{boundary}\r\nContent-Type: application/json\r\n\r\n'.encode(),
+            json.dumps(payload).encode('utf-8'),
+            b'\r\n'
+        ]
+        if jpeg is not None:
+            parts += [f'--{boundary}\r\nContent-Type: image/jpeg\r\n\r\n'.encode(), jpeg, b'\r\n']
+        parts.append(f'--{boundary}--\r\n'.encode())
+        return b''.join(parts), f'multipart/mixed; boundary={boundary}'
+
+    raise ValueError(f"Unsupported response format: {fmt}")
@@ -2,8 +2,11 @@
 """Script to show available YOLOv8 models and their capabilities"""
 
 from ultralytics import YOLO
+import json
 import os
 
+BENCHMARK_REPORT = 'benchmark_results/benchmark_report.json'
+
 def show_available_models():
     print("🔧 Available YOLOv8 Models:")
     print("=" * 50)
@@ -53,6 +56,28 @@ def show_available_models():
         print(f"   Accuracy: {info['accuracy']}")
         print(f"   Use Case: {info['description']}")
         print()
+    
+    if not show_benchmark_report():
+        print("💡 Run benchmark_models.py for measured speed/accuracy on this machine")
+
+def show_benchmark_report(report_path=BENCHMARK_REPORT):
+    """Print the measured Pareto frontier from benchmark_models.py, if a report exists"""
+    if not os.path.exists(report_path):
+        return False
+    
+    with open(report_path, 'r') as f:
+        report = json.load(f)
+    
+    print(f"📊 Measured on this machine ({report['benchmark_date'][:10]}, {report_path}):")
+    rows = report['pareto_frontier'] or sorted(report['results'], key=lambda row: -row.get('images_per_second', 0))
+    for row in rows:
+        if 'error' in row:
+            continue
+        accuracy = f"mAP50-95 {row['mAP50-95']:.3f}" if row.get('mAP50-95') is not None else "mAP n/a"
+        print(f"   {row['model']:<12} imgsz={row['imgsz']:<4} batch={row['batch_size']:<3} "
+              f"{row['images_per_second']:>7.1f} img/s  batch p95 {row['batch_latency_p95_ms']:>8.1f} ms  {accuracy}")
+    print()
+    return True
 
 def show_detectable_classes():
     print("🎯 Standard COCO Dataset Classes (80 objects):")
@@ -16,7 +16,11 @@ import yaml
 import shutil
 from pathlib import Path
 from ultralytics import YOLO
+from image_cache import ImageCache, unletterbox_detections
+from detection_utils import result_to_array
+from detection_metrics import DetectionMetrics, label_path_for, load_yolo_labels
 import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
 import json
 
@@ -221,21 +225,32 @@ class ModelEvaluator:
     def __init__(self):
         self.results = {}
     
-    def evaluate_model(self, model_path, test_images_dir, conf_threshold=0.25):
+    def evaluate_model(self, model_path, test_images_dir, conf_threshold=0.25, image_cache=None, model=None):
         """
         Evaluate a model on test images
+        
+        Pass the same image_cache to every call when comparing models, so each
+        test image is decoded and letterboxed only once; without one, images are
+        decoded as they are read and nothing is kept. Pass the loaded model to
+        avoid loading the checkpoint again.
         """
         print(f"📊 Evaluating model: {model_path}")
         
-        model = YOLO(model_path)
+        if model is None:
+            model = YOLO(model_path)
         test_dir = Path(test_images_dir)
+        if image_cache is None:
+            image_cache = ImageCache(max_bytes=0)
         
         total_detections = 0
         total_images = 0
         confidence_scores = []
         
-        for img_path in test_dir.glob("*.jpg"):
-            results = model(str(img_path), conf=conf_threshold)
+        for img_path in sorted(test_dir.glob("*.jpg")):
+            image, _ = image_cache.get(img_path)
+            if image is None:
+                continue
+            results = model(image, conf=conf_threshold, imgsz=image_cache.imgsz)
             
             total_images += 1
             image_detections = len(results[0].boxes) if results[0].boxes is not None else 0
@@ -259,7 +274,7 @@ class ModelEvaluator:
             'confidence_threshold': conf_threshold
         }
         
-        self.results[model_path] = evaluation_result
+        self.results.setdefault(model_path, {}).update(evaluation_result)
         
         print(f"  📈 Results:")
         print(f"     Total images processed: {total_images}")
@@ -269,27 +284,223 @@ class ModelEvaluator:
         
         return evaluation_result
     
-    def compare_models(self, model_paths, test_images_dir):
+    def evaluate_accuracy(self, model_path, dataset_dir, split='test', conf_threshold=0.001, iou_threshold=0.7,
+                          batch_size=16, image_cache=None, report_conf=0.25, model=None):
+        """
+        Measure precision, recall, mAP@0.5 and mAP@0.5:0.95 against ground truth labels
+        
+        Reads the ModelTrainer dataset layout (dataset/images/<split>, dataset/labels/<split>
+        with YOLO-format .txt labels). Each image's detections are matched to its labels
+        and folded into a fixed-size DetectionMetrics accumulator, so memory stays flat
+        however large the test set is. Without an image_cache, images are streamed
+        (decoded per batch, nothing kept).
+        """
+        dataset_dir = Path(dataset_dir)
+        images_root = dataset_dir / "images" / split
+        labels_root = dataset_dir / "labels" / split
+        if not images_root.exists():
+            print(f"❌ Images not found: {images_root}")
+            return None
+        
+        print(f"🎯 Measuring accuracy of {model_path} on {images_root}")
+        
+        if model is None:
+            model = YOLO(model_path)
+        if image_cache is None:
+            image_cache = ImageCache(max_bytes=0)
+        metrics = DetectionMetrics(len(model.names))
+        
+        image_paths = sorted(p for p in images_root.rglob("*") if p.suffix.lower() in ('.jpg', '.jpeg', '.png', '.bmp'))
+        for i in range(0, len(image_paths), batch_size):
+            images, metas, paths = image_cache.load_batch(image_paths[i:i + batch_size])
+            if not images:
+                continue
+            results = model(images, conf=conf_threshold, iou=iou_threshold, imgsz=image_cache.imgsz, verbose=False)
+            
+            for image_path, meta, result in zip(paths, metas, results):
+                data = unletterbox_detections(result_to_array(result), meta)
+                height, width = meta['shape']
+                gt_classes, gt_boxes = load_yolo_labels(label_path_for(image_path, images_root, labels_root),
+                                                        width, height)
+                try:
+                    metrics.update(data, gt_classes, gt_boxes)
+                except ValueError as e:
+                    print(f"❌ {image_path}: {e}")
+                    return None
+        
+        accuracy = metrics.compute(conf_threshold=report_conf, names=model.names)
+        accuracy['split'] = split
+        self.results.setdefault(model_path, {'model_path': model_path}).update(accuracy)
+        
+        print(f"  📈 Accuracy ({accuracy['images']} images, {accuracy['ground_truth']} labeled objects):")
+        print(f"     Precision: {accuracy['precision']:.3f}  Recall: {accuracy['recall']:.3f} (conf >= {report_conf})")
+        print(f"     mAP@0.5: {accuracy['mAP50']:.3f}  mAP@0.5:0.95: {accuracy['mAP50-95']:.3f}")
+        
+        return accuracy
+    
+    def compare_models(self, model_paths, test_images_dir, imgsz=640, cache_dir=None, cache_bytes=2 * 1024 ** 3,
+                       dataset_dir=None, split='test', workers=1, threads_per_worker=None, results_file=None):
         """
         Compare multiple models on the same test set
+        
+        Test images are decoded once into a shared ImageCache (memory-mapped under
+        cache_dir if given, capped at cache_bytes) and reused by every model. With
+        dataset_dir, precision / recall / mAP against its labels are compared too.
+        
+        A directory in model_paths stands for all the .pt checkpoints in it. With
+        workers > 1, checkpoints are evaluated in a process pool, each worker limited
+        to threads_per_worker torch threads (default: CPU cores / workers); results
+        land in self.results as workers finish. Workers share the decoded images only
+        through cache_dir, which is filled once up front; without it they stream. With results_file, each
+        finished model is appended as a JSON line and models already in the file
+        (same imgsz and evaluations) are skipped, so an interrupted sweep resumes.
         """
         print("🔍 Comparing models...")
         
+        model_paths = expand_checkpoints(model_paths)
+        pending = []
+        done = load_evaluation_results(results_file) if results_file else {}
         for model_path in model_paths:
-            self.evaluate_model(model_path, test_images_dir)
+            result = done.get(model_path)
+            if result is not None and _evaluation_complete(result, imgsz, test_images_dir, dataset_dir):
+                self.results.setdefault(model_path, {}).update(result)
+                print(f"⏭️  Already evaluated: {model_path}")
+            else:
+                pending.append(model_path)
+        
+        if workers > 1 and len(pending) > 1:
+            workers = min(workers, len(pending))
+            if threads_per_worker is None:
+                threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+            if cache_dir:
+                with ImageCache(imgsz, max_bytes=cache_bytes, cache_dir=cache_dir) as image_cache:
+                    _warm_image_cache(image_cache, test_images_dir, dataset_dir, split)
+                    print(f"🗂️  Image cache: {image_cache.stats()}")
+            
+            print(f"🧵 Evaluating {len(pending)} models across {workers} worker processes "
+                  f"({threads_per_worker} torch threads each)")
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    executor.submit(_evaluate_checkpoint, model_path, test_images_dir, imgsz, cache_dir, cache_bytes,
+                                    dataset_dir, split, threads_per_worker): model_path
+                    for model_path in pending
+                }
+                for finished, future in enumerate(as_completed(futures), 1):
+                    model_path = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        print(f"   ❌ Evaluation of {model_path} failed: {str(e)}")
+                        continue
+                    self.results.setdefault(model_path, {}).update(result)
+                    if results_file:
+                        append_evaluation_result(results_file, result)
+                    print(f"   🧩 Finished {model_path} ({finished}/{len(pending)})")
+        else:
+            with ImageCache(imgsz, max_bytes=cache_bytes, cache_dir=cache_dir) as image_cache:
+                for model_path in pending:
+                    model = YOLO(model_path)
+                    if test_images_dir:
+                        self.evaluate_model(model_path, test_images_dir, image_cache=image_cache, model=model)
+                    if dataset_dir:
+                        self.evaluate_accuracy(model_path, dataset_dir, split, image_cache=image_cache, model=model)
+                    if results_file and model_path in self.results:
+                        self.results[model_path]['imgsz'] = imgsz
+                        append_evaluation_result(results_file, self.results[model_path])
+                print(f"🗂️  Image cache: {image_cache.stats()}")
         
         # Print comparison
         print("\n📊 Model Comparison Summary:")
-        print("=" * 80)
-        print(f"{'Model':<30} {'Avg Detections':<15} {'Avg Confidence':<15}")
-        print("-" * 80)
+        print("=" * 100)
+        print(f"{'Model':<30} {'Avg Detections':<15} {'Avg Confidence':<15} {'Precision':<10} {'Recall':<10} {'mAP50':<8} {'mAP50-95':<8}")
+        print("-" * 100)
         
-        for model_path, result in self.results.items():
+        for model_path in model_paths:
+            result = self.results.get(model_path)
+            if result is None:
+                continue
             model_name = Path(model_path).name
-            print(f"{model_name:<30} {result['avg_detections_per_image']:<15.2f} {result['avg_confidence']:<15.3f}")
+            detections = f"{result['avg_detections_per_image']:.2f}" if 'avg_detections_per_image' in result else '-'
+            confidence = f"{result['avg_confidence']:.3f}" if 'avg_confidence' in result else '-'
+            accuracy = [f"{result[key]:.3f}" if key in result else '-'
+                        for key in ('precision', 'recall', 'mAP50', 'mAP50-95')]
+            print(f"{model_name:<30} {detections:<15} {confidence:<15} {accuracy[0]:<10} {accuracy[1]:<10} "
+                  f"{accuracy[2]:<8} {accuracy[3]:<8}")
         
         return self.results
 
+def expand_checkpoints(model_paths):
+    """Replace each directory in model_paths with the .pt checkpoints inside it (e.g. a run's weights/ folder)"""
+    expanded = []
+    for model_path in model_paths:
+        if Path(model_path).is_dir():
+            expanded.extend(str(p) for p in sorted(Path(model_path).glob("*.pt")))
+        else:
+            expanded.append(str(model_path))
+    return expanded
+
+def load_evaluation_results(results_file):
+    """Read a compare_models results file (one JSON object per line) into {model_path: result}"""
+    results = {}
+    if not Path(results_file).exists():
+        return results
+    with open(results_file, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # Partial line from an interrupted run
+            results[result['model_path']] = result
+    return results
+
+def append_evaluation_result(results_file, result):
+    """Append one model's result to the results file"""
+    Path(results_file).parent.mkdir(parents=True, exist_ok=True)
+    with open(results_file, 'a') as f:
+        f.write(json.dumps(result, default=float) + "\n")
+        f.flush()
+
+def _evaluation_complete(result, imgsz, test_images_dir, dataset_dir):
+    """Whether a saved result covers the evaluations requested now"""
+    if result.get('imgsz') != imgsz:
+        return False
+    if test_images_dir and 'avg_detections_per_image' not in result:
+        return False
+    if dataset_dir and 'mAP50' not in result:
+        return False
+    return True
+
+def _warm_image_cache(image_cache, test_images_dir, dataset_dir, split):
+    """Decode every image the evaluations will read, so workers only read the shared cache"""
+    if test_images_dir:
+        image_cache.load_batch(sorted(Path(test_images_dir).glob("*.jpg")))
+    if dataset_dir:
+        images_root = Path(dataset_dir) / "images" / split
+        if images_root.exists():
+            image_cache.load_batch(sorted(p for p in images_root.rglob("*")
+                                          if p.suffix.lower() in ('.jpg', '.jpeg', '.png', '.bmp')))
+
+def _evaluate_checkpoint(model_path, test_images_dir, imgsz, cache_dir, cache_bytes, dataset_dir, split, num_threads):
+    """Worker process entry point: evaluate one checkpoint with a bounded number of torch threads"""
+    import torch
+    torch.set_num_threads(num_threads)
+    
+    evaluator = ModelEvaluator()
+    model = YOLO(model_path)
+    # Without the shared cache_dir a per-worker cache would be rebuilt per checkpoint: stream instead
+    with ImageCache(imgsz, max_bytes=cache_bytes if cache_dir else 0, cache_dir=cache_dir) as image_cache:
+        if test_images_dir:
+            evaluator.evaluate_model(model_path, test_images_dir, image_cache=image_cache, model=model)
+        if dataset_dir:
+            evaluator.evaluate_accuracy(model_path, dataset_dir, split, image_cache=image_cache, model=model)
+    
+    result = evaluator.results.get(model_path, {'model_path': model_path})
+    result['imgsz'] = imgsz
+    return result
+
 def main():
     parser = argparse.ArgumentParser(description="YOLOv8 Model Training and Improvement")
     parser.add_argument("--action", choices=['train', 'finetune', 'evaluate', 'compare'], required=True,
@@ -300,13 +511,26 @@ def main():
     parser.add_argument("--epochs", type=int, default=100,
                         help="Number of training epochs")
     parser.add_argument("--dataset_dir", 
-                        help="Directory containing training dataset")
+                        help="train: directory of source images to prepare; "
+                             "evaluate/compare: dataset root with images/<split> and labels/<split> for accuracy")
     parser.add_argument("--class_names", nargs='+',
                         help="List of class names for custom training")
     parser.add_argument("--test_images", 
                         help="Directory containing test images for evaluation")
     parser.add_argument("--models", nargs='+',
                         help="List of model paths for comparison")
+    parser.add_argument("--imgsz", type=int, default=640,
+                        help="Model input size for evaluation")
+    parser.add_argument("--cache_dir",
+                        help="Persist decoded test images here (memory-mapped) for reuse across runs")
+    parser.add_argument("--split", default="test",
+                        help="Dataset split whose labels are used for accuracy (with --dataset_dir)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Evaluate this many models in parallel worker processes (compare)")
+    parser.add_argument("--threads_per_worker", type=int,
+                        help="Torch threads per worker process (default: CPU cores / workers)")
+    parser.add_argument("--results_file",
+                        help="Append each model's result here as JSON lines and skip models already in it (compare)")
     
     args = parser.parse_args()
     
@@ -328,21 +552,29 @@ def main():
         trainer.fine_tune_pretrained(args.base_model, epochs=args.epochs)
     
     elif args.action == 'evaluate':
-        if not args.models or not args.test_images:
-            print("❌ Model path and test images directory required for evaluation")
+        if not args.models or not (args.test_images or args.dataset_dir):
+            print("❌ Model path and test images directory (or --dataset_dir with labels) required for evaluation")
             return
         
         evaluator = ModelEvaluator()
-        for model_path in args.models:
-            evaluator.evaluate_model(model_path, args.test_images)
+        with ImageCache(args.imgsz, cache_dir=args.cache_dir) as image_cache:
+            for model_path in args.models:
+                model = YOLO(model_path)
+                if args.test_images:
+                    evaluator.evaluate_model(model_path, args.test_images, image_cache=image_cache, model=model)
+                if args.dataset_dir:
+                    evaluator.evaluate_accuracy(model_path, args.dataset_dir, args.split, image_cache=image_cache,
+                                                model=model)
     
     elif args.action == 'compare':
-        if not args.models or not args.test_images:
-            print("❌ Model paths and test images directory required for comparison")
+        if not args.models or not (args.test_images or args.dataset_dir):
+            print("❌ Model paths and test images directory (or --dataset_dir with labels) required for comparison")
             return
         
         evaluator = ModelEvaluator()
-        evaluator.compare_models(args.models, args.test_images)
+        evaluator.compare_models(args.models, args.test_images, imgsz=args.imgsz, cache_dir=args.cache_dir,
+                                 dataset_dir=args.dataset_dir, split=args.split, workers=args.workers,
+                                 threads_per_worker=args.threads_per_worker, results_file=args.results_file)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Async (ASGI) server for the detection web API
+Serves /upload and /camera_capture on uvicorn, sharing models, batching and
+response building with web_interface.py (live streaming stays on the Flask app)
+"""
+
+import argparse
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import uvicorn
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse, Response
+    from starlette.routing import Route
+except ImportError:
+    raise ImportError("The ASGI server requires starlette, uvicorn and python-multipart: "
+                      "pip install starlette uvicorn python-multipart")
+
+from werkzeug.utils import secure_filename
+
+from web_interface import (MAX_CONTENT_LENGTH, OUTPUT_FOLDER, UPLOAD_FOLDER, allowed_file, build_detection_response,
+                           decode_upload, device, get_output_retention, grab_camera_frame, inference_scheduler,
+                           load_model, response_options, save_options)
+
+# Blocking work (decode, model loading, rendering, camera reads) runs on this pool,
+# never on the event loop; inference itself goes through the shared micro-batch scheduler
+CPU_WORKERS = 4
+# Requests past this many in decode/inference/encode wait for a slot, after their upload has been read
+MAX_IN_FLIGHT = 16
+
+cpu_executor = None
+in_flight = None
+
+async def run_blocking(fn, *args, **kwargs):
+    """Run a blocking function on the CPU pool"""
+    global cpu_executor
+    if cpu_executor is None:
+        cpu_executor = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="asgi-cpu")
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(cpu_executor, lambda: fn(*args, **kwargs))
+
+def _detection_slot():
+    global in_flight
+    if in_flight is None:
+        in_flight = asyncio.Semaphore(MAX_IN_FLIGHT)
+    return in_flight
+
+def _detect_from_disk(model, data, file_path, confidence):
+    """Fallback for uploads OpenCV cannot decode (videos, GIFs): let the model read a file"""
+    try:
+        file_path.write_bytes(data)
+        return model(str(file_path), conf=confidence, iou=0.5, verbose=False, device=device)[0]
+    finally:
+        if file_path.exists():
+            file_path.unlink()
+
+def _request_values(request, form):
+    """Query string and form fields together, like Flask's request.values"""
+    values = dict(request.query_params)
+    values.update((key, value) for key, value in form.items() if isinstance(value, str))
+    return values
+
+def _too_large():
+    return JSONResponse({'error': f'File too large (max {MAX_CONTENT_LENGTH // (1024 * 1024)}MB)'}, status_code=413)
+
+async def upload(request):
+    """Async counterpart of web_interface.upload_file"""
+    # Same limit as Flask's MAX_CONTENT_LENGTH, checked before request.form() spools the body.
+    # A chunked body has no length to check, so require one; uvicorn never reads past it
+    content_length = request.headers.get('content-length', '')
+    if not content_length.isdigit():
+        return JSONResponse({'error': 'Content-Length required'}, status_code=411)
+    if int(content_length) > MAX_CONTENT_LENGTH:
+        return _too_large()
+
+    form = await request.form()
+    try:
+        return await _upload(request, form)
+    finally:
+        # Releases the spooled temp files of the uploaded parts
+        await form.close()
+
+async def _upload(request, form):
+    file = form.get('file')
+    if file is None or not getattr(file, 'filename', ''):
+        return JSONResponse({'error': 'No file selected'}, status_code=400)
+
+    if not allowed_file(file.filename):
+        return JSONResponse({'error': 'File type not supported'}, status_code=400)
+
+    model_path = form.get('model', 'models/yolov8m.pt')
+    confidence = float(form.get('confidence', 0.25))
+    try:
+        values = _request_values(request, form)
+        fmt, include_image = response_options(values, request.headers.get('accept'))
+        artifacts = save_options(values)
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+
+    # Read the whole file before taking a slot, so slow uploads don't hold inference capacity
+    data = await file.read()
+    filename = secure_filename(file.filename)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+    async with _detection_slot():
+        try:
+            model = await run_blocking(load_model, model_path)
+            if model is None:
+                return JSONResponse({'error': f'Could not load model: {model_path}'}, status_code=500)
+
+            img = await run_blocking(decode_upload, data)
+            if img is not None:
+                result = await asyncio.wrap_future(
+                    inference_scheduler.submit(model, img, conf=confidence, iou=0.5, verbose=False, device=device)
+                )
+            else:
+                file_path = Path(UPLOAD_FOLDER) / f"{timestamp}_{filename}"
+                result = await run_blocking(_detect_from_disk, model, data, file_path, confidence)
+
+            save_base = Path(OUTPUT_FOLDER) / f"{timestamp}_{filename}"
+            body, content_type = await run_blocking(build_detection_response, result, model, model_path, confidence,
+                                                    save_base=save_base, artifacts=artifacts,
+                                                    fmt=fmt, include_image=include_image)
+            return Response(body, headers={'content-type': content_type})
+
+        except Exception as e:
+            return JSONResponse({'error': f'Detection failed: {str(e)}'}, status_code=500)
+
+async def camera_capture(request):
+    """Async counterpart of web_interface.camera_capture"""
+    form = None
+    try:
+        form = await request.form()
+        model_path = form.get('model', 'models/yolov8m.pt')
+        confidence = float(form.get('confidence', 0.25))
+        camera_index = int(form.get('camera_index', 0))
+        try:
+            fmt, include_image = response_options(_request_values(request, form), request.headers.get('accept'))
+        except ValueError as e:
+            return JSONResponse({'error': str(e)}, status_code=400)
+
+        async with _detection_slot():
+            model = await run_blocking(load_model, model_path)
+            if model is None:
+                return JSONResponse({'error': f'Could not load model: {model_path}'}, status_code=500)
+
+            frame, error = await run_blocking(grab_camera_frame, camera_index)
+            if frame is None:
+                return JSONResponse({'error': error}, status_code=500)
+
+            result = await asyncio.wrap_future(
+                inference_scheduler.submit(model, frame, conf=confidence, iou=0.5, verbose=False, device=device)
+            )
+            body, content_type = await run_blocking(build_detection_response, result, model, model_path, confidence,
+                                                    fmt=fmt, include_image=include_image)
+            return Response(body, headers={'content-type': content_type})
+
+    except Exception as e:
+        return JSONResponse({'error': f'Camera capture failed: {str(e)}'}, status_code=500)
+    finally:
+        if form is not None:
+            await form.close()
+
+# Live detection (/start_live_detection, /live_detection_status, ...) is not served here:
+# its state lives in the Flask process that runs the camera workers
+app = Starlette(routes=[
+    Route('/upload', upload, methods=['POST']),
+    Route('/camera_capture', camera_capture, methods=['POST']),
+])
+
+def main():
+    """Run the API on uvicorn"""
+    global CPU_WORKERS, MAX_IN_FLIGHT
+
+    parser = argparse.ArgumentParser(description="Async Object Detection API (ASGI)")
+    parser.add_argument("--host", default="127.0.0.1", help="Host to bind to")
+    parser.add_argument("--port", type=int, default=8000, help="Port to bind to")
+    parser.add_argument("--cpu-workers", type=int, default=CPU_WORKERS,
+                        help="Threads for decode, rendering and model loading")
+    parser.add_argument("--max-in-flight", type=int, default=MAX_IN_FLIGHT,
+                        help="Requests processed at once; later ones wait after their upload is read")
+    args = parser.parse_args()
+
+    CPU_WORKERS = args.cpu_workers
+    MAX_IN_FLIGHT = args.max_in_flight
+
+    print("🚀 Starting Async Object Detection API")
+    print(f"🔗 Access at: http://{args.host}:{args.port}")
+    print(f"🎯 Device: {device}")
+    print(f"⚡ CPU workers: {CPU_WORKERS}, max in flight: {MAX_IN_FLIGHT}")
+    print("🔄 Pre-loading YOLOv8n model...")
+    load_model('models/yolov8n.pt')
+    get_output_retention()
+    print("✅ Ready to serve!")
+
+    # One process: models, the batch scheduler and the CPU pool are shared in memory
+    uvicorn.run(app, host=args.host, port=args.port, workers=1)
+
+if __name__ == "__main__":
+    main()
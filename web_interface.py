@@ -16,17 +16,23 @@ from werkzeug.utils import secure_filename
 from pathlib import Path
 from datetime import datetime
 from ultralytics import YOLO
+from detection_utils import result_to_array, to_report_detections
+from response_formats import encode_detection_response, negotiate_format, wants_image
+from live_stream import AdaptiveRateController, LiveDetectionState, LiveStreamHub, LiveStreamWorker
+from inference_scheduler import MicroBatchScheduler
+from model_registry import ModelRegistry
+from background_writer import BackgroundWriter, RetainedDirectory
 import tempfile
 import threading
-import time
 import torch
 
 app = Flask(__name__)
 app.secret_key = 'object_detection_secret_key'
 
 # Flask optimization settings
+MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size (web_asgi.py enforces it too)
+app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
 app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 300  # Cache static files for 5 minutes
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 
 # Configuration
 UPLOAD_FOLDER = 'web_uploads'
@@ -37,47 +43,123 @@ ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'tiff', 'webp', 'mp4',
 Path(UPLOAD_FOLDER).mkdir(exist_ok=True)
 Path(OUTPUT_FOLDER).mkdir(exist_ok=True)
 
-# Global model storage with optimization
-models = {}
 device = 'cuda' if torch.cuda.is_available() else 'cpu'
 print(f"🚀 Using device: {device}")
 
-# Global variables for live camera
-live_camera_active = False
-live_camera_thread = None
-live_frame = None
-live_detections = None
+# Live camera state: active flag plus latest frame and detections, versioned and lock-protected
+live_state = LiveDetectionState()
+
+# One shared capture + inference worker per (camera, model, confidence) stream
+live_stream_hub = LiveStreamHub()
 
 # Performance optimization settings
-FRAME_SKIP = 2  # Process every 2nd frame for better performance
 MAX_FRAME_SIZE = (640, 480)  # Limit frame size for faster processing
 JPEG_QUALITY = 70  # Reduce quality for faster streaming
+TARGET_STREAM_FPS = 30  # Live stream output rate the adaptive controller aims for
+STREAM_LATENCY_BUDGET = 0.2  # Seconds allowed for inference + encode before downgrading
+STREAM_IMGSZ_LEVELS = (640, 480, 320)  # Inference sizes used as the stream degrades under load
+STREAM_JPEG_LEVELS = (JPEG_QUALITY, 55, 40)  # Matching JPEG qualities
+REUSE_ANNOTATED_FRAME = True  # Re-send the last annotated frame instead of encoding skipped raw frames
+MAX_UPLOAD_SIZE = 1024  # Longest side of uploaded images passed to the model
+MAX_INFERENCE_BATCH = 8  # Most concurrent requests coalesced into one predict call
+BATCH_WINDOW = 0.008  # Seconds a request waits for others to join its batch
+MAX_RESIDENT_MODELS = 3  # Most models kept loaded at once
+MODEL_MEMORY_BUDGET_MB = 1024  # Estimated weight memory allowed before evicting models
+
+# Upload output settings (requests can override with save=0|1 and artifacts=annotated,detections)
+OUTPUT_ARTIFACTS = ('annotated', 'detections')
+SAVE_UPLOAD_RESULTS = True  # Save upload results to OUTPUT_FOLDER unless the request says otherwise
+SAVE_ARTIFACTS = ('annotated',)  # What gets saved by default
+OUTPUT_MAX_FILES = 1000  # Oldest saved files are deleted beyond this count
+OUTPUT_MAX_AGE_DAYS = 7  # ...or once they are this old
+OUTPUT_WRITER_BACKLOG = 64  # Pending saves before the oldest is dropped
+
+# Central queue that batches /upload and /camera_capture inference per model
+inference_scheduler = MicroBatchScheduler(max_batch=MAX_INFERENCE_BATCH, max_wait=BATCH_WINDOW)
+
+# Upload results are saved off the request thread, within the retention limits
+output_writer = BackgroundWriter(max_backlog=OUTPUT_WRITER_BACKLOG, name="web-output-writer")
+# Created by the server on startup (or the first save), never at import: it prunes OUTPUT_FOLDER
+output_retention = None
+_output_retention_lock = threading.Lock()
+
+def get_output_retention():
+    """The RetainedDirectory for OUTPUT_FOLDER; every file written there must go through its add()"""
+    global output_retention
+    with _output_retention_lock:
+        if output_retention is None:
+            output_retention = RetainedDirectory(OUTPUT_FOLDER, max_files=OUTPUT_MAX_FILES,
+                                                 max_age=OUTPUT_MAX_AGE_DAYS * 24 * 3600)
+        return output_retention
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def _reduced_decode_flag(width, height, max_size):
+    """Pick the largest JPEG decode reduction that still leaves the longest side >= max_size"""
+    longest = max(width, height)
+    for factor, flag in ((8, cv2.IMREAD_REDUCED_COLOR_8),
+                         (4, cv2.IMREAD_REDUCED_COLOR_4),
+                         (2, cv2.IMREAD_REDUCED_COLOR_2)):
+        if longest // factor >= max_size:
+            return flag
+    return cv2.IMREAD_COLOR
+
+def decode_upload(data, max_size=MAX_UPLOAD_SIZE):
+    """
+    Decode uploaded image bytes in memory and limit the longest side to max_size.
+    
+    Oversized JPEGs are decoded at 1/2, 1/4 or 1/8 scale by libjpeg itself (only the
+    header is parsed to choose the scale), so large photos are never decoded at full
+    resolution just to be shrunk again.
+    
+    Returns:
+        numpy.ndarray: BGR image, or None if the bytes are not a decodable image.
+    """
+    flag = cv2.IMREAD_COLOR
+    try:
+        with Image.open(BytesIO(data)) as probe:
+            if probe.format == 'JPEG':
+                flag = _reduced_decode_flag(probe.size[0], probe.size[1], max_size)
+    except Exception:
+        pass
+    
+    img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flag)
+    if img is None:
+        return None
+    
+    height, width = img.shape[:2]
+    if width > max_size or height > max_size:
+        scale = min(max_size/width, max_size/height)
+        img = cv2.resize(img, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+    return img
+
+def _load_yolo(model_path):
+    """Load a YOLO model onto the serving device and optimize it for inference"""
+    model = YOLO(model_path)
+    model.to(device)
+    
+    # Optimize model for inference
+    if device == 'cuda':
+        try:
+            model.model.half()  # Use half precision for speed
+            print(f"✅ Loaded model: {model_path} (GPU optimized)")
+        except:
+            print(f"✅ Loaded model: {model_path} (GPU)")
+    else:
+        print(f"✅ Loaded model: {model_path} (CPU)")
+    return model
+
+# Resident models: loaded once per path, least recently used evicted over budget
+models = ModelRegistry(_load_yolo, max_models=MAX_RESIDENT_MODELS, memory_budget_mb=MODEL_MEMORY_BUDGET_MB)
+
 def load_model(model_path):
     """Load YOLO model with caching and optimization"""
-    if model_path not in models:
-        try:
-            model = YOLO(model_path)
-            model.to(device)
-            
-            # Optimize model for inference
-            if device == 'cuda':
-                try:
-                    model.model.half()  # Use half precision for speed
-                    print(f"✅ Loaded model: {model_path} (GPU optimized)")
-                except:
-                    print(f"✅ Loaded model: {model_path} (GPU)")
-            else:
-                print(f"✅ Loaded model: {model_path} (CPU)")
-                
-            models[model_path] = model
-        except Exception as e:
-            print(f"❌ Error loading model {model_path}: {e}")
-            return None
-    return models[model_path]
+    try:
+        return models.get(model_path)
+    except Exception as e:
+        print(f"❌ Error loading model {model_path}: {e}")
+        return None
 
 def get_available_models():
     """Get list of available models"""
@@ -98,6 +180,135 @@ def get_available_models():
     
     return sorted(model_files)
 
+def _persist_result(result, names, save_base, artifacts, jpeg=None):
+    """Write the requested artefacts for one upload (runs on the output writer thread)"""
+    if 'annotated' in artifacts:
+        image_path = save_base.with_name(f"{save_base.name}_detected.jpg")
+        if jpeg is not None:
+            # Already encoded for the response
+            image_path.write_bytes(jpeg)
+        else:
+            cv2.imwrite(str(image_path), result.plot())
+        get_output_retention().add(image_path)
+    
+    if 'detections' in artifacts:
+        json_path = save_base.with_name(f"{save_base.name}_detections.json")
+        with open(json_path, 'w') as f:
+            json.dump(to_report_detections(result_to_array(result), names, conf_digits=3, bbox_digits=1), f)
+        get_output_retention().add(json_path)
+
+def build_detection_response(result, model, model_path, confidence, save_base=None, artifacts=(),
+                             fmt='json', include_image=True):
+    """
+    Build the body returned by /upload and /camera_capture.
+    
+    The annotated image is only drawn and encoded when the client asked for it, so
+    detections-only clients skip plot() and imencode. Saving happens afterwards on
+    the output writer thread and never delays the response.
+    
+    Args:
+        result: ultralytics Results for the image.
+        model: The model that produced it (for class names).
+        model_path (str): Model path reported back to the client.
+        confidence (float): Confidence threshold reported back to the client.
+        save_base (Path): Output path prefix for saved artefacts (None to save nothing).
+        artifacts (tuple): Artefacts to save: 'annotated' and/or 'detections'.
+        fmt (str): Response format (see response_formats.RESPONSE_FORMATS).
+        include_image (bool): Include the annotated image in the response.
+    
+    Returns:
+        tuple: (body bytes, content type)
+    """
+    jpeg = None
+    if include_image:
+        # Generate annotated image and encode with optimized quality
+        annotated_img = result.plot()
+        encode_params = [cv2.IMWRITE_JPEG_QUALITY, 85]
+        _, buffer = cv2.imencode('.jpg', annotated_img, encode_params)
+        jpeg = buffer.tobytes()
+    
+    meta = {'model_used': model_path, 'confidence_threshold': confidence}
+    body, content_type = encode_detection_response(fmt, result, model.names, meta, jpeg=jpeg)
+    
+    if save_base is not None and artifacts:
+        output_writer.submit(_persist_result, result, model.names, save_base, artifacts, jpeg)
+    return body, content_type
+
+def save_options(values):
+    """
+    Read the `save` and `artifacts` request parameters.
+    
+    Returns:
+        tuple: Artefacts to save for this request (empty when nothing should be saved).
+    
+    Raises:
+        ValueError: For an unknown artefact.
+    """
+    save = values.get('save')
+    if save is None or save == '':
+        save = SAVE_UPLOAD_RESULTS
+    else:
+        save = save.lower() not in ('0', 'false', 'no', 'none')
+    if not save:
+        return ()
+    
+    artifacts = values.get('artifacts')
+    if not artifacts:
+        return SAVE_ARTIFACTS
+    artifacts = tuple(a.strip().lower() for a in artifacts.split(',') if a.strip())
+    unknown = [a for a in artifacts if a not in OUTPUT_ARTIFACTS]
+    if unknown:
+        raise ValueError(f"Unknown artifacts: {', '.join(unknown)} (choose from {', '.join(OUTPUT_ARTIFACTS)})")
+    return artifacts
+
+def response_options(values, accept):
+    """
+    Read the `format` and `image` request parameters.
+    
+    Returns:
+        tuple: (format, include_image)
+    
+    Raises:
+        ValueError: For an unknown format.
+    """
+    fmt = negotiate_format(values.get('format'), accept)
+    return fmt, wants_image(fmt, values.get('image'))
+
+def grab_camera_frame(camera_index):
+    """
+    Capture a single frame for /camera_capture, limited to MAX_FRAME_SIZE.
+    
+    Returns:
+        tuple: (frame, None) on success, (None, error message) otherwise.
+    """
+    # Capture from camera with optimization
+    cap = cv2.VideoCapture(camera_index)
+    if not cap.isOpened():
+        return None, f'Could not open camera {camera_index}'
+    
+    # Set optimal capture settings
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, MAX_FRAME_SIZE[0])
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, MAX_FRAME_SIZE[1])
+    
+    # Warm up camera
+    for _ in range(3):
+        cap.read()
+    
+    ret, frame = cap.read()
+    cap.release()
+    
+    if not ret:
+        return None, 'Failed to capture frame'
+    
+    # Resize if needed for faster processing
+    height, width = frame.shape[:2]
+    if width > MAX_FRAME_SIZE[0] or height > MAX_FRAME_SIZE[1]:
+        scale = min(MAX_FRAME_SIZE[0]/width, MAX_FRAME_SIZE[1]/height)
+        new_width = int(width * scale)
+        new_height = int(height * scale)
+        frame = cv2.resize(frame, (new_width, new_height))
+    return frame, None
+
 @app.route('/')
 def index():
     """Main page"""
@@ -120,85 +331,54 @@ def upload_file():
     # Get parameters
     model_path = request.form.get('model', 'models/yolov8m.pt')
     confidence = float(request.form.get('confidence', 0.25))
+    try:
+        fmt, include_image = response_options(request.values, request.headers.get('Accept'))
+        artifacts = save_options(request.values)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
+    file_path = None
     try:
-        # Save uploaded file
         filename = secure_filename(file.filename)
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        file_path = Path(UPLOAD_FOLDER) / f"{timestamp}_{filename}"
-        file.save(file_path)
         
-        # Optimize image for faster processing
-        img = cv2.imread(str(file_path))
-        if img is not None:
-            height, width = img.shape[:2]
-            # Resize large images for faster processing
-            max_size = 1024
-            if width > max_size or height > max_size:
-                scale = min(max_size/width, max_size/height)
-                new_width = int(width * scale)
-                new_height = int(height * scale)
-                img = cv2.resize(img, (new_width, new_height))
-                cv2.imwrite(str(file_path), img)
+        # Decode straight from the request body, shrinking large images while decoding
+        data = file.read()
+        img = decode_upload(data)
+        if img is None:
+            # Not an image OpenCV can decode (e.g. video or GIF): let the model read it from disk
+            file_path = Path(UPLOAD_FOLDER) / f"{timestamp}_{filename}"
+            file_path.write_bytes(data)
         
         # Load model
         model = load_model(model_path)
         if model is None:
             return jsonify({'error': f'Could not load model: {model_path}'}), 500
         
-        # Run detection with optimized settings
-        results = model(str(file_path), 
-                       conf=confidence, 
-                       iou=0.5,
-                       verbose=False,
-                       device=device)
-        result = results[0]
-        
-        # Generate annotated image
-        annotated_img = result.plot()
-        
-        # Convert to base64 for web display with optimized quality
-        encode_params = [cv2.IMWRITE_JPEG_QUALITY, 85]
-        _, buffer = cv2.imencode('.jpg', annotated_img, encode_params)
-        img_base64 = base64.b64encode(buffer).decode('utf-8')
-        
-        # Prepare detection data (simplified for speed)
-        detections = []
-        if result.boxes is not None:
-            for box in result.boxes:
-                class_id = int(box.cls[0])
-                confidence_score = float(box.conf[0])
-                class_name = model.names[class_id]
-                bbox = box.xyxy[0].tolist()
-                
-                detections.append({
-                    'class': class_name,
-                    'confidence': round(confidence_score, 3),
-                    'bbox': {
-                        'x1': round(bbox[0], 1), 'y1': round(bbox[1], 1),
-                        'x2': round(bbox[2], 1), 'y2': round(bbox[3], 1)
-                    }
-                })
-        
-        # Save results
-        output_path = Path(OUTPUT_FOLDER) / f"{timestamp}_{filename}_detected.jpg"
-        cv2.imwrite(str(output_path), annotated_img)
-        
-        return jsonify({
-            'success': True,
-            'image': img_base64,
-            'detections': detections,
-            'objects_count': len(detections),
-            'model_used': model_path,
-            'confidence_threshold': confidence
-        })
+        # Run detection with optimized settings; images share batches with concurrent requests
+        if img is not None:
+            result = inference_scheduler.predict(model, img, conf=confidence, iou=0.5, verbose=False, device=device)
+        else:
+            results = model(str(file_path), 
+                           conf=confidence, 
+                           iou=0.5,
+                           verbose=False,
+                           device=device)
+            result = results[0]
+        
+        # Requested artefacts are saved in the background after the response is built
+        save_base = Path(OUTPUT_FOLDER) / f"{timestamp}_{filename}"
+        body, content_type = build_detection_response(result, model, model_path, confidence,
+                                                      save_base=save_base, artifacts=artifacts,
+                                                      fmt=fmt, include_image=include_image)
+        return Response(body, content_type=content_type)
         
     except Exception as e:
         return jsonify({'error': f'Detection failed: {str(e)}'}), 500
     
     finally:
-        # Clean up uploaded file
-        if file_path.exists():
+        # Clean up the fallback file, if one was needed
+        if file_path is not None and file_path.exists():
             file_path.unlink()
 
 @app.route('/camera')
@@ -215,32 +395,33 @@ def camera_capture():
         model_path = request.form.get('model', 'models/yolov8m.pt')
         confidence = float(request.form.get('confidence', 0.25))
         camera_index = int(request.form.get('camera_index', 0))
+        try:
+            fmt, include_image = response_options(request.values, request.headers.get('Accept'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         # Load model
         model = load_model(model_path)
         if model is None:
             return jsonify({'error': f'Could not load model: {model_path}'}), 500
         
-        # Capture from camera with optimization
-        cap = cv2.VideoCapture(camera_index)
-        if not cap.isOpened():
-            return jsonify({'error': f'Could not open camera {camera_index}'}), 500
-        
-        # Set optimal capture settings
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, MAX_FRAME_SIZE[0])
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, MAX_FRAME_SIZE[1])
-        
-        # Warm up camera
-        for _ in range(3):
-            cap.read()
-        
-        ret, frame = cap.read()
-        cap.release()
+        frame, error = grab_camera_frame(camera_index)
+        if frame is None:
+            return jsonify({'error': error}), 500
         
-        if not ret:
-            return jsonify({'error': 'Failed to capture frame'}), 500
+        # Run detection with optimized settings
+        result = inference_scheduler.predict(model, frame, conf=confidence, iou=0.5, verbose=False, device=device)
+        body, content_type = build_detection_response(result, model, model_path, confidence,
+                                                      fmt=fmt, include_image=include_image)
+        return Response(body, content_type=content_type)
         
-        # Resize if needed for faster processing
+    except Exception as e:
+        return jsonify({'error': f'Camera capture failed: {str(e)}'}), 500
+
+def make_live_frame_processor(model, confidence):
+    """Build the per-frame inference step for a live stream worker"""
+    def process_frame(frame, imgsz=640):
+        # Resize frame for faster processing
         height, width = frame.shape[:2]
         if width > MAX_FRAME_SIZE[0] or height > MAX_FRAME_SIZE[1]:
             scale = min(MAX_FRAME_SIZE[0]/width, MAX_FRAME_SIZE[1]/height)
@@ -250,139 +431,83 @@ def camera_capture():
         
         # Run detection with optimized settings
         results = model(frame, 
-                       conf=confidence, 
-                       iou=0.5,
-                       verbose=False,
-                       device=device)
+                      conf=confidence, 
+                      iou=0.5,  # Higher IOU for faster NMS
+                      imgsz=imgsz,
+                      verbose=False,
+                      device=device)
         result = results[0]
         
         # Generate annotated image
-        annotated_img = result.plot()
-        
-        # Convert to base64 with optimized quality
-        encode_params = [cv2.IMWRITE_JPEG_QUALITY, 85]
-        _, buffer = cv2.imencode('.jpg', annotated_img, encode_params)
-        img_base64 = base64.b64encode(buffer).decode('utf-8')
-        
-        # Prepare detection data
-        detections = []
-        if result.boxes is not None:
-            for box in result.boxes:
-                class_id = int(box.cls[0])
-                confidence_score = float(box.conf[0])
-                class_name = model.names[class_id]
-                bbox = box.xyxy[0].tolist()
-                
-                detections.append({
-                    'class': class_name,
-                    'confidence': round(confidence_score, 3),
-                    'bbox': {
-                        'x1': round(bbox[0], 1), 'y1': round(bbox[1], 1),
-                        'x2': round(bbox[2], 1), 'y2': round(bbox[3], 1)
-                    }
-                })
-        
-        return jsonify({
-            'success': True,
-            'image': img_base64,
-            'detections': detections,
-            'objects_count': len(detections),
-            'model_used': model_path,
-            'confidence_threshold': confidence
-        })
+        annotated_frame = result.plot()
         
-    except Exception as e:
-        return jsonify({'error': f'Camera capture failed: {str(e)}'}), 500
-
-def generate_frames(camera_index=0, model_path='models/yolov8m.pt', confidence=0.25):
-    """Generate frames for live camera stream with performance optimizations"""
-    global live_camera_active, live_frame, live_detections
+        # Prepare detection data (simplified, reduced precision)
+        detections = to_report_detections(result_to_array(result), model.names,
+                                          conf_digits=2, bbox_format=None)
+        return annotated_frame, detections
     
-    # Load model
+    return process_frame
+
+def publish_live_result(packet):
+    """Store the latest annotated frame (with its cached JPEG) and detections for other routes"""
+    live_state.publish(packet)
+
+def create_live_stream_worker(camera_index, model_path, confidence):
+    """Factory for the shared capture + inference worker of one live stream"""
     model = load_model(model_path)
     if model is None:
-        return
+        return None
     
-    cap = cv2.VideoCapture(camera_index)
-    if not cap.isOpened():
-        return
+    return LiveStreamWorker(
+        (camera_index, model_path, confidence),
+        camera_index,
+        make_live_frame_processor(model, confidence),
+        frame_size=MAX_FRAME_SIZE,
+        fps=TARGET_STREAM_FPS,
+        controller=AdaptiveRateController(
+            target_fps=TARGET_STREAM_FPS,
+            latency_budget=STREAM_LATENCY_BUDGET,
+            imgsz_levels=STREAM_IMGSZ_LEVELS,
+            jpeg_levels=STREAM_JPEG_LEVELS
+        ),
+        reuse_annotated=REUSE_ANNOTATED_FRAME,
+        on_result=publish_live_result
+    )
+
+def generate_frames(camera_index=0, model_path='models/yolov8m.pt', confidence=0.25):
+    """
+    Generate MJPEG frames for one viewer of a live camera stream.
     
-    # Optimize camera settings for speed
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, MAX_FRAME_SIZE[0])
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, MAX_FRAME_SIZE[1])
-    cap.set(cv2.CAP_PROP_FPS, 30)
-    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # Reduce buffer for latest frame
+    All viewers of the same (camera, model, confidence) share one capture + inference
+    worker; the worker is started by the first viewer and stopped after the last one
+    disconnects.
+    """
+    worker = live_stream_hub.acquire(
+        (camera_index, model_path, confidence),
+        lambda: create_live_stream_worker(camera_index, model_path, confidence)
+    )
+    if worker is None:
+        return
     
-    frame_count = 0
+    version = None
     
     try:
-        while live_camera_active:
-            ret, frame = cap.read()
-            if not ret:
-                break
+        while live_state.active:
+            version, packet = worker.wait_frame(version, timeout=1.0)
+            if packet is None:
+                if not worker.is_running:
+                    break
+                continue
             
-            frame_count += 1
+            # Encoded once per frame and shared by every viewer
+            frame_bytes = packet.jpeg_bytes()
             
-            # Skip frames for better performance
-            if frame_count % FRAME_SKIP == 0:
-                # Resize frame for faster processing
-                height, width = frame.shape[:2]
-                if width > MAX_FRAME_SIZE[0] or height > MAX_FRAME_SIZE[1]:
-                    scale = min(MAX_FRAME_SIZE[0]/width, MAX_FRAME_SIZE[1]/height)
-                    new_width = int(width * scale)
-                    new_height = int(height * scale)
-                    frame = cv2.resize(frame, (new_width, new_height))
-                
-                # Run detection with optimized settings
-                results = model(frame, 
-                              conf=confidence, 
-                              iou=0.5,  # Higher IOU for faster NMS
-                              verbose=False,
-                              device=device)
-                result = results[0]
-                
-                # Generate annotated image
-                annotated_frame = result.plot()
-                
-                # Store current frame and detections for other routes
-                live_frame = annotated_frame.copy()
-                
-                # Prepare detection data (simplified)
-                detections = []
-                if result.boxes is not None:
-                    for box in result.boxes:
-                        class_id = int(box.cls[0])
-                        confidence_score = float(box.conf[0])
-                        class_name = model.names[class_id]
-                        
-                        detections.append({
-                            'class': class_name,
-                            'confidence': round(confidence_score, 2)  # Reduced precision
-                        })
-                
-                live_detections = detections
-                
-                # Encode frame to JPEG with optimized quality
-                encode_params = [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY]
-                _, buffer = cv2.imencode('.jpg', annotated_frame, encode_params)
-                frame_bytes = buffer.tobytes()
-                
-                # Yield frame in multipart format
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-            else:
-                # For skipped frames, just encode the raw frame
-                encode_params = [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY]
-                _, buffer = cv2.imencode('.jpg', frame, encode_params)
-                frame_bytes = buffer.tobytes()
-                
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-            
-            time.sleep(0.03)  # ~30 FPS cap
+            # Yield frame in multipart format
+            yield (b'--frame\r\n'
+                   b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
             
     finally:
-        cap.release()
+        live_stream_hub.release(worker)
 
 @app.route('/camera_stream')
 def camera_stream():
@@ -397,9 +522,7 @@ def camera_stream():
 @app.route('/start_live_detection', methods=['POST'])
 def start_live_detection():
     """Start live camera detection"""
-    global live_camera_active, live_camera_thread
-    
-    if live_camera_active:
+    if live_state.active:
         return jsonify({'success': False, 'error': 'Live detection already active'}), 400
     
     try:
@@ -420,7 +543,7 @@ def start_live_detection():
         if model is None:
             return jsonify({'success': False, 'error': f'Cannot load model {model_path}. Please check if the model file exists.'}), 400
         
-        live_camera_active = True
+        live_state.set_active(True)
         
         return jsonify({
             'success': True,
@@ -431,58 +554,87 @@ def start_live_detection():
     except ValueError as e:
         return jsonify({'success': False, 'error': f'Invalid parameter values: {str(e)}'}), 400
     except Exception as e:
-        live_camera_active = False
+        live_state.set_active(False)
         return jsonify({'success': False, 'error': f'Failed to start live detection: {str(e)}'}), 500
 
 @app.route('/stop_live_detection', methods=['POST'])
 def stop_live_detection():
     """Stop live camera detection"""
-    global live_camera_active, live_camera_thread
-    
-    live_camera_active = False
-    
-    if live_camera_thread and live_camera_thread.is_alive():
-        live_camera_thread.join(timeout=2)
+    live_state.set_active(False)
+    live_stream_hub.stop_all()
     
     return jsonify({'success': True, 'message': 'Live detection stopped'})
 
+def live_status_payload():
+    """Current live detection state as returned by /live_detection_status"""
+    snapshot = live_state.snapshot()
+    return {
+        'active': snapshot['active'],
+        'detections': snapshot['detections'],
+        'objects_count': len(snapshot['detections'])
+    }
+
 @app.route('/live_detection_status')
 def live_detection_status():
     """Get current live detection status and data"""
-    global live_camera_active, live_detections
+    return jsonify(live_status_payload())
+
+def generate_detection_events(keepalive=15.0):
+    """
+    Server-sent events carrying each new live detection set as it is published.
     
-    return jsonify({
-        'active': live_camera_active,
-        'detections': live_detections if live_detections else [],
-        'objects_count': len(live_detections) if live_detections else 0
-    })
+    Each client blocks on the shared state until the version changes, so pushing
+    costs one event per detection update instead of one request per poll.
+    """
+    # Tell the browser how quickly to reconnect if the connection drops
+    yield 'retry: 2000\n\n'
+    
+    version = None
+    while True:
+        snapshot = live_state.wait_for_update(version, timeout=keepalive)
+        if snapshot is None:
+            # Comment line keeps proxies from closing an idle connection
+            yield ': keepalive\n\n'
+            continue
+        version = snapshot['version']
+        yield live_state.event(snapshot)
+
+@app.route('/live_detections_stream')
+def live_detections_stream():
+    """Push live detections to the browser (EventSource) instead of polling"""
+    return Response(generate_detection_events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route('/capture_live_frame', methods=['POST'])
 def capture_live_frame():
     """Capture current live frame"""
-    global live_frame, live_detections
+    snapshot = live_state.snapshot()
+    live_frame = snapshot['frame']
+    live_detections = snapshot['detections']
     
-    if not live_camera_active or live_frame is None:
+    if not snapshot['active'] or live_frame is None:
         return jsonify({'error': 'No live detection active'}), 400
     
     try:
-        # Save the current frame
+        # Save the current frame, reusing the JPEG bytes already encoded for the stream
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"live_capture_{timestamp}.jpg"
         output_path = Path(OUTPUT_FOLDER) / filename
         
-        cv2.imwrite(str(output_path), live_frame)
+        frame_bytes = live_frame.jpeg_bytes()
+        with open(output_path, 'wb') as f:
+            f.write(frame_bytes)
+        get_output_retention().add(output_path)
         
         # Convert to base64 for response
-        _, buffer = cv2.imencode('.jpg', live_frame)
-        img_base64 = base64.b64encode(buffer).decode('utf-8')
+        img_base64 = base64.b64encode(frame_bytes).decode('utf-8')
         
         return jsonify({
             'success': True,
             'image': img_base64,
             'filename': filename,
-            'detections': live_detections if live_detections else [],
-            'objects_count': len(live_detections) if live_detections else 0
+            'detections': live_detections,
+            'objects_count': len(live_detections)
         })
         
     except Exception as e:
@@ -496,12 +648,10 @@ def camera_feed():
 @app.route('/get_live_detections')
 def get_live_detections():
     """Get current live detection results"""
-    global live_detections
-    
     try:
         return jsonify({
             'success': True,
-            'detections': live_detections if live_detections else []
+            'detections': live_state.snapshot()['detections']
         })
     except Exception as e:
         return jsonify({
@@ -557,15 +707,33 @@ def test_camera():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/loaded_models')
+def loaded_models():
+    """List resident models with registry hit/miss/eviction counters"""
+    return jsonify(models.stats())
+
 @app.route('/debug_live_status')
 def debug_live_status():
     """Debug live detection status"""
-    global live_camera_active, live_frame, live_detections
+    snapshot = live_state.snapshot()
+    live_frame = snapshot['frame']
     
     return jsonify({
-        'live_camera_active': live_camera_active,
+        'live_camera_active': snapshot['active'],
         'live_frame_available': live_frame is not None,
-        'live_detections_count': len(live_detections) if live_detections else 0,
+        'live_frame_bytes': len(live_frame.jpeg_bytes()) if live_frame is not None else 0,
+        'live_detections_count': len(snapshot['detections']),
+        'live_state_version': snapshot['version'],
+        'live_streams': live_stream_hub.stats(),
+        'inference_batching': inference_scheduler.stats(),
+        'output_writer': {
+            'backlog': output_writer.backlog,
+            'written': output_writer.written,
+            'dropped': output_writer.dropped,
+            'failed': output_writer.failed,
+            'retained_files': len(output_retention) if output_retention is not None else None,
+            'deleted_files': output_retention.deleted if output_retention is not None else 0
+        },
         'available_models': get_available_models()
     })
 
@@ -583,11 +751,12 @@ def main():
     print(f"🚀 Starting Fast Object Detection Web Interface")
     print(f"🔗 Access at: http://{args.host}:{args.port}")
     print(f"🎯 Device: {device}")
-    print(f"⚡ Optimizations: Frame skipping, GPU acceleration, Model caching")
+    print(f"⚡ Optimizations: Adaptive frame rate, GPU acceleration, Model caching")
     print(f"📱 Features: File Upload, Live Camera, Performance Optimized")
       # Pre-load the fastest model for better first-time performance
     print("🔄 Pre-loading YOLOv8n model...")
     load_model('models/yolov8n.pt')
+    get_output_retention()
     print("✅ Ready to serve!")
     
     app.run(host=args.host, port=args.port, debug=args.debug, threaded=args.threaded)